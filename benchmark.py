@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import random
+import argparse
+import contextlib
+import tempfile
+import shutil
+import sys
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import generate
+import spdx_stub_server
+
+LICENSE_CHOICES = ["MIT", "Apache-2.0", "BSD-3-Clause", "GPL-2.0-only", "LGPL-2.1-only", "EPL-2.0", "MPL-2.0", "ISC"]
+
+# Components draw their license entry from a table of this many weighted samples
+LICENSE_TABLE_SIZE = 1 << 16
+DEFAULT_LICENSE_MIX = "ids=0.6,expressions=0.25,names=0.15"
+DEFAULT_SIZES = "1000,100000,1000000"
+
+def synthetic_component(rng, component_index, licenses=None):
+    return {
+        "group": f"org.example.group{component_index % 500}",
+        "name": f"artifact-{component_index}",
+        "version": f"1.{component_index % 20}.0",
+        "licenses": licenses if licenses is not None else [{"license": {"id": rng.choice(LICENSE_CHOICES)}}],
+        "externalReferences": [{"type": "vcs", "url": f"https://github.com/example/repo-{component_index % 2000}"}],
+    }
+
+def write_synthetic_sboms(directory, files, components_per_file, duplication=0.3, seed=0, license_table=None):
+    """Write files SBOMs of components_per_file components, of which a duplication share repeats components of other files.
+
+    With a license_table, every component takes its licenses from the table by its index, so
+    duplicated components always carry the same licenses.
+    """
+    rng = random.Random(seed)
+    unique_components = max(1, int(files * components_per_file * (1 - duplication)))
+    for file_index in range(files):
+        components = []
+        for _ in range(components_per_file):
+            component_index = rng.randrange(unique_components)
+            licenses = license_table[component_index % len(license_table)] if license_table else None
+            components.append(synthetic_component(rng, component_index, licenses))
+        with open(os.path.join(directory, f"module-{file_index:05d}.json"), "w") as file:
+            json.dump({"bomFormat": "CycloneDX", "specVersion": "1.5", "components": components}, file)
+
+def parse_license_mix(mix):
+    weights = {"ids": 0.0, "expressions": 0.0, "names": 0.0}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in weights:
+            raise ValueError(f"Unknown license kind '{kind}' in --mix, expected ids, expressions or names")
+        weights[kind.strip()] = float(weight)
+    return weights
+
+def synthetic_license_table(license_ids, exception_ids, mix, skew, distinct, seed=0):
+    """Return LICENSE_TABLE_SIZE license lists sampled from distinct entries in the given kind mix.
+
+    Entries are drawn with Zipf weights 1 / rank ** skew, so a higher skew concentrates the
+    components on fewer licenses, as in real dependency trees.
+    """
+    rng = random.Random(seed)
+    kinds = list(mix)
+    id_weights = [1 / (rank + 1) ** skew for rank in range(len(license_ids))]
+
+    def pick_id():
+        return rng.choices(license_ids, id_weights)[0]
+
+    entries = []
+    for entry_index in range(distinct):
+        kind = rng.choices(kinds, [mix[kind] for kind in kinds])[0]
+        if kind == "ids":
+            entries.append([{"license": {"id": pick_id()}}])
+        elif kind == "expressions":
+            if entry_index % 3 == 0:
+                entries.append([{"expression": f"{pick_id()} WITH {rng.choice(exception_ids)}"}])
+            else:
+                entries.append([{"expression": f"({pick_id()} OR {pick_id()}) AND {pick_id()}"}])
+        elif entry_index % 4 == 0:
+            # Names no mapping or license list matches, as found in hand-written SBOMs
+            entries.append([{"license": {"name": f"Custom License {entry_index}", "url": f"https://example.com/license/{entry_index}"}}])
+        else:
+            entries.append([{"license": {"name": f"The {pick_id().replace('-', ' ')} Licence"}}])
+
+    entry_weights = [1 / (rank + 1) ** skew for rank in range(len(entries))]
+    return rng.choices(entries, entry_weights, k=LICENSE_TABLE_SIZE)
+
+def worker_counts(max_workers):
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    return counts
+
+def benchmark_ingest(args):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sbom_dir = args.sbom_dir
+        if not sbom_dir:
+            sbom_dir = temp_dir
+            write_synthetic_sboms(sbom_dir, args.files, args.components_per_file)
+
+        results = []
+        baseline = None
+        for workers in worker_counts(args.max_workers or os.cpu_count() or 1):
+            started = time.perf_counter()
+            components = sum(1 for _ in generate.iter_sbom_components(sbom_dir, streaming=args.streaming, workers=workers))
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            results.append({"workers": workers, "seconds": round(elapsed, 4), "components": components, "speedup": round(baseline / elapsed, 2)})
+            print(f"{workers:>3} workers: {elapsed:8.3f} s, {components} components, {baseline / elapsed:5.2f}x")
+    return results
+
+def deep_sizeof(root):
+    # Counts every reachable object once, so shared and interned strings are only paid for once
+    seen = set()
+    size = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif hasattr(obj, '__slots__'):
+            pending.extend(getattr(obj, slot) for slot in obj.__slots__)
+    return size
+
+def measure_store(components, build):
+    store = {}
+    for component in components:
+        key, value = build(component)
+        store[key] = value
+    # Shared license entries live in a module-level table and are part of the record store's cost
+    return deep_sizeof((store, generate.LICENSE_ENTRIES))
+
+def benchmark_memory(args):
+    def parsed_components():
+        # Decode each component separately so that, as with real SBOMs, no strings are shared up front
+        rng = random.Random(0)
+        for component_index in range(args.components):
+            yield json.loads(json.dumps(synthetic_component(rng, component_index)))
+
+    dict_size = measure_store(parsed_components(), lambda component: (generate.component_key(component), generate.project_component(component)))
+    record_size = measure_store(parsed_components(), lambda component: (generate.component_key(component), generate.make_component_record(component)))
+
+    print(f"{args.components} components")
+    print(f"  parsed dicts:      {dict_size / 2 ** 20:8.1f} MiB")
+    print(f"  component records: {record_size / 2 ** 20:8.1f} MiB ({dict_size / record_size:.1f}x smaller)")
+    return [
+        {"store": "dict", "components": args.components, "bytes": dict_size},
+        {"store": "record", "components": args.components, "bytes": record_size},
+    ]
+
+def synthetic_license_entry(rng, license_ids, exception_ids, entry_index):
+    kind = entry_index % 4
+    if kind == 0:
+        return {"license": {"id": rng.choice(license_ids), "url": f"https://example.com/licenses/{entry_index}"}}
+    if kind == 1:
+        return {"expression": f"({rng.choice(license_ids)} OR {rng.choice(license_ids)}) AND {rng.choice(license_ids)}+ WITH {rng.choice(exception_ids)}"}
+    if kind == 2:
+        return {"license": {"name": f"{rng.choice(license_ids)} License, variant {entry_index}"}}
+    return {"expression": f"{rng.choice(license_ids)} AND LicenseRef-custom-{entry_index} OR {rng.choice(license_ids)}"}
+
+def benchmark_resolve(args):
+    # The lookups come from the stub server's synthetic dataset; nothing is fetched
+    documents = spdx_stub_server.build_dataset("http://127.0.0.1/", args.licenses, args.exceptions)
+    licenses_lookup = generate.build_licenses_lookup(documents["licenses.json"]["licenses"])
+    exceptions_lookup = generate.build_exceptions_lookup(documents["exceptions.json"]["exceptions"])
+    license_ids = [license["licenseId"] for license in documents["licenses.json"]["licenses"]]
+    exception_ids = [exception["licenseExceptionId"] for exception in documents["exceptions.json"]["exceptions"]]
+
+    rng = random.Random(0)
+    entries = [synthetic_license_entry(rng, license_ids, exception_ids, entry_index) for entry_index in range(args.distinct_licenses)]
+    records = []
+    for component_index in range(args.components):
+        component = synthetic_component(rng, component_index)
+        component["licenses"] = [rng.choice(entries)]
+        records.append((generate.component_key(component), generate.make_component_record(component)))
+
+    results = []
+    baseline = None
+    workers = args.workers or os.cpu_count() or 1
+    for executor in generate.RESOLVE_EXECUTORS:
+        generate.clear_resolution_cache()
+        generate.parse_license_expression.cache_clear()
+        generate.RESOLVE_SETTINGS.update({'executor': executor, 'workers': workers, 'chunk_size': args.chunk_size})
+
+        started = time.perf_counter()
+        generate.resolve_license_entries(dict.fromkeys(entry_key for _, record in records for entry_key in record.licenses), licenses_lookup, exceptions_lookup)
+        rows = [generate.process_component(key, record, licenses_lookup, exceptions_lookup) for key, record in records]
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        distinct = len(generate.LICENSE_RESOLUTIONS)
+        results.append({
+            "executor": executor,
+            "workers": 1 if executor == 'serial' else workers,
+            "chunk_size": args.chunk_size,
+            "seconds": round(elapsed, 4),
+            "components": len(rows),
+            "distinct_licenses": distinct,
+            "licenses_per_second": round(distinct / elapsed),
+            "speedup": round(baseline / elapsed, 2),
+        })
+        print(f"{executor:>8}: {elapsed:8.3f} s, {len(rows)} components, {distinct / elapsed:10.0f} licenses/s, {baseline / elapsed:5.2f}x")
+    return results
+
+def peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def pipeline_arguments(config):
+    arguments = [
+        '--sbom-dir', config["sbom_dir"],
+        '--cache-dir', config["cache_dir"],
+        '--spdx-data-url', config["spdx_data_url"],
+        '--fetch-backend', config["fetch_backend"],
+        '--fetch-workers', str(config["fetch_workers"]),
+        '--executor', config["executor"],
+        '--ingest-workers', str(config["ingest_workers"]),
+        '--html-report', config["html_report"],
+    ]
+    return arguments + (['--streaming'] if config["streaming"] else [])
+
+def run_pipeline(config):
+    """Run generate.py's command line on one SBOM directory and return the time spent in each stage.
+
+    The stages are the ones generate.py records for --metrics-file, so the benchmark always times what a
+    real run does. Runs in a fresh process, so the peak RSS belongs to this run alone.
+    """
+    # Reports are written to the working directory, as from the command line
+    os.chdir(config["output_dir"])
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            generate.main(pipeline_arguments(config))
+        except SystemExit as e:
+            if e.code:
+                raise RuntimeError(f"generate.py exited with status {e.code}") from None
+    seconds = time.perf_counter() - started
+    metrics = generate.METRICS.to_dict()
+
+    return {
+        "seconds": round(seconds, 4),
+        "stages": metrics["stages"],
+        # SBOMs are parsed while components are resolved, so their share of the resolve stage is timed separately
+        "load_seconds": metrics["timers"].get("sbom_load", {}).get("seconds"),
+        "components": metrics["counts"]["components"],
+        "distinct_licenses": metrics["counts"]["distinct_license_entries"],
+        "license_texts": metrics["counts"]["license_texts"],
+        "peak_rss": peak_rss(),
+    }
+
+def benchmark_pipeline(args):
+    server = spdx_stub_server.start_stub_server(license_count=args.licenses, exception_count=args.exceptions, latency=args.latency / 1000.0)
+    license_ids = spdx_stub_server.synthetic_license_ids(args.licenses)
+    exception_ids = spdx_stub_server.synthetic_exception_ids(args.exceptions)
+    license_table = synthetic_license_table(license_ids, exception_ids, parse_license_mix(args.mix), args.skew, args.distinct_licenses, args.seed)
+    # A spawned process starts from a clean interpreter, so its peak RSS is not inflated by this one
+    context = multiprocessing.get_context("spawn")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if args.warm_cache:
+                cache_dir = os.path.join(temp_dir, "cache")
+            for size in (int(size) for size in args.sizes.split(",")):
+                run_dir = os.path.join(temp_dir, f"run-{size}")
+                sbom_dir = os.path.join(run_dir, "sboms")
+                output_dir = os.path.join(run_dir, "output")
+                os.makedirs(sbom_dir)
+                os.makedirs(output_dir)
+                files = max(1, -(-size // args.components_per_file))
+                write_synthetic_sboms(sbom_dir, files, min(size, args.components_per_file), args.duplication, args.seed, license_table)
+
+                config = {
+                    "sbom_dir": sbom_dir,
+                    "output_dir": output_dir,
+                    "cache_dir": cache_dir if args.warm_cache else os.path.join(run_dir, "cache"),
+                    "spdx_data_url": server.base_url,
+                    "fetch_backend": args.fetch_backend,
+                    "fetch_workers": args.fetch_workers,
+                    "executor": args.executor,
+                    "streaming": args.streaming,
+                    "ingest_workers": args.ingest_workers,
+                    "html_report": args.html_report,
+                }
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    if args.warm_cache:
+                        executor.submit(run_pipeline, config).result()
+                    result = executor.submit(run_pipeline, config).result()
+                result = dict({"size": size, "files": files}, **result)
+                results.append(result)
+
+                stages = ", ".join(f"{stage} {seconds:.3f} s" for stage, seconds in result["stages"].items())
+                rss = f"{result['peak_rss'] / 2 ** 20:.0f} MiB" if result["peak_rss"] else "n/a"
+                load = f"; SBOM loading {result['load_seconds']:.3f} s of resolve" if result["load_seconds"] is not None else ""
+                # Components are drawn with repeats, so fewer than size of them are unique
+                print(f"{size:>8} drawn, {result['components']:>8} unique components: {result['seconds']:8.3f} s ({stages}{load}), peak RSS {rss}")
+                shutil.rmtree(run_dir)
+    finally:
+        server.shutdown()
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("run", "output")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "runs": results,
+    }
+
+def main():
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument('--output', type=str, help='Write the results to a JSON file')
+
+    parser = argparse.ArgumentParser(description='Benchmarks for generate.py.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', parents=[common_parser], help='Measure SBOM ingestion scaling from 1 to N processes')
+    ingest_parser.add_argument('--sbom-dir', type=str, help='Benchmark an existing SBOM directory instead of synthetic files')
+    ingest_parser.add_argument('--files', type=int, default=2000, help='Number of synthetic SBOM files (default: 2000)')
+    ingest_parser.add_argument('--components-per-file', type=int, default=200, help='Components per synthetic SBOM file (default: 200)')
+    ingest_parser.add_argument('--max-workers', type=int, help='Largest number of worker processes to measure (default: CPU count)')
+    ingest_parser.add_argument('--streaming', action='store_true', help='Use the streaming SBOM loader')
+    ingest_parser.set_defaults(run=benchmark_ingest)
+
+    memory_parser = subparsers.add_parser('memory', parents=[common_parser], help='Compare the memory of parsed component dicts and compact component records')
+    memory_parser.add_argument('--components', type=int, default=500000, help='Number of synthetic components (default: 500000)')
+    memory_parser.set_defaults(run=benchmark_memory)
+
+    resolve_parser = subparsers.add_parser('resolve', parents=[common_parser], help='Compare license resolution throughput of the serial, thread and process executors')
+    resolve_parser.add_argument('--components', type=int, default=200000, help='Number of synthetic components (default: 200000)')
+    resolve_parser.add_argument('--distinct-licenses', type=int, default=50000, help='Number of distinct license entries shared by the components (default: 50000)')
+    resolve_parser.add_argument('--licenses', type=int, default=500, help='Number of synthetic SPDX licenses (default: 500)')
+    resolve_parser.add_argument('--exceptions', type=int, default=50, help='Number of synthetic SPDX exceptions (default: 50)')
+    resolve_parser.add_argument('--workers', type=int, help='Threads or processes for the parallel executors (default: CPU count)')
+    resolve_parser.add_argument('--chunk-size', type=int, default=generate.RESOLVE_CHUNK_SIZE, help=f'License entries per task (default: {generate.RESOLVE_CHUNK_SIZE})')
+    resolve_parser.set_defaults(run=benchmark_resolve)
+
+    pipeline_parser = subparsers.add_parser('pipeline', parents=[common_parser], help='Measure wall time, peak RSS and per-stage time of a full run against the local SPDX stub server')
+    pipeline_parser.add_argument('--sizes', type=str, default=DEFAULT_SIZES, help=f'Comma-separated numbers of components to draw, including repeats, per measurement (default: {DEFAULT_SIZES})')
+    pipeline_parser.add_argument('--components-per-file', type=int, default=500, help='Components per synthetic SBOM file (default: 500)')
+    pipeline_parser.add_argument('--duplication', type=float, default=0.3, help='Share of components repeated across files (default: 0.3)')
+    pipeline_parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of the license distribution, 0 for uniform (default: 1.1)')
+    pipeline_parser.add_argument('--mix', type=str, default=DEFAULT_LICENSE_MIX, help=f'Weights of license IDs, expressions and names (default: {DEFAULT_LICENSE_MIX})')
+    pipeline_parser.add_argument('--distinct-licenses', type=int, default=2000, help='Number of distinct license entries (default: 2000)')
+    pipeline_parser.add_argument('--licenses', type=int, default=500, help='Number of SPDX licenses served by the stub (default: 500)')
+    pipeline_parser.add_argument('--exceptions', type=int, default=50, help='Number of SPDX exceptions served by the stub (default: 50)')
+    pipeline_parser.add_argument('--latency', type=float, default=20.0, help='Stub server latency per request in milliseconds (default: 20)')
+    pipeline_parser.add_argument('--warm-cache', action='store_true', help='Measure with a warm SPDX cache instead of a cold one')
+    pipeline_parser.add_argument('--fetch-backend', choices=['threads', 'async'], default='threads', help='License text download backend (default: threads)')
+    pipeline_parser.add_argument('--fetch-workers', type=int, default=generate.FETCH_WORKERS, help=f'Concurrent license text downloads (default: {generate.FETCH_WORKERS})')
+    pipeline_parser.add_argument('--executor', choices=generate.RESOLVE_EXECUTORS, default='serial', help='License resolution executor (default: serial)')
+    pipeline_parser.add_argument('--ingest-workers', type=int, default=1, help='SBOM parsing processes (default: 1)')
+    pipeline_parser.add_argument('--streaming', action='store_true', help='Use the streaming SBOM loader')
+    pipeline_parser.add_argument('--html-report', choices=['table', 'virtual'], default='table', help='HTML report format (default: table)')
+    pipeline_parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data (default: 0)')
+    pipeline_parser.set_defaults(run=benchmark_pipeline)
+
+    args = parser.parse_args()
+
+    results = args.run(args)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"benchmark": args.benchmark, "results": results}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
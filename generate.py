@@ -1,38 +1,919 @@
 import os
+import ssl
+import base64
 import json
+import gzip
 import re
+import html
+import time
+import random
+import asyncio
+import hashlib
+import sys
+import functools
+import itertools
+import threading
+import contextlib
+import cProfile
+import socketserver
+import signal
+import stat
+import multiprocessing
 import requests
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urljoin, urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Directory containing SBOM JSON files
 SBOMS_DIR = "sboms"
+# SBOM file name suffixes, plain or gzip-compressed
+SBOM_EXTENSIONS = (".json", ".json.gz")
+# Component fields used by the reports; everything else is dropped while streaming
+COMPONENT_FIELDS = ("group", "name", "version", "licenses", "externalReferences")
+STREAM_CHUNK_SIZE = 1 << 20
+JSON_WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+# What may follow a prefix of a JSON number, e.g. the '.5' of '2.5' when a chunk ends after '2.'
+JSON_NUMBER_TAIL_PATTERN = re.compile(r'[0-9.eE+-]*')
 # Hosted licenses JSON URLs
 LICENSES_URL = "https://raw.githubusercontent.com/spdx/license-list-data/main/json/licenses.json"
 EXCEPTIONS_URL = "https://raw.githubusercontent.com/spdx/license-list-data/main/json/exceptions.json"
+# Versioned SPDX license-list-data layout, used when pinning a license list version
+SPDX_DATA_URL = "https://raw.githubusercontent.com/spdx/license-list-data/{version}/json/"
+
+# Local cache of SPDX lists and per-license detail documents
+CACHE_DIR = ".spdx_cache"
+CACHE_TTL = 24 * 60 * 60
+
+# HTTP settings for SPDX downloads
+FETCH_WORKERS = 10
+REQUEST_TIMEOUT = 30
+FETCH_RETRIES = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# SPDX license expression grammar
+EXPRESSION_OPERATORS = {'AND', 'OR', 'WITH'}
+EXPRESSION_KEYWORDS = {'or', 'and', 'with', 'without', 'exception'}
+EXPRESSION_TOKEN_PATTERN = re.compile(r'[()]|[^\s()]+')
+LICENSE_ID_PATTERN = re.compile(r'^[A-Za-z0-9.\-]+\+?$')
+LICENSE_REF_PATTERN = re.compile(r'^(DocumentRef-[A-Za-z0-9.\-]+:)?LicenseRef-[A-Za-z0-9.\-]+$')
+# Number of distinct license expressions whose resolution is kept in memory
+EXPRESSION_CACHE_SIZE = 4096
+
+# License names are compared by these tokens, ignoring case, punctuation and the spelling of versions
+LICENSE_NAME_TOKEN_PATTERN = re.compile(r'[a-z]+|\d+(?:\.\d+)*|\+')
+LICENSE_NAME_VERSION_PREFIX_PATTERN = re.compile(r'\bv(?=\d)')
+LICENSE_NAME_STOP_WORDS = {'the', 'version'}
+SUGGESTION_LIMIT = 3
+SUGGESTION_MIN_SCORE = 0.3
+
+# Distinct license entries are resolved in chunks of this size by the thread and process executors
+RESOLVE_EXECUTORS = ('serial', 'thread', 'process')
+RESOLVE_CHUNK_SIZE = 256
+
+# Upper bounds in milliseconds of the HTTP latency histogram buckets
+HTTP_LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+METRICS_ERROR_MESSAGES = 100
+
+# --serve mode
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8080
+SERVE_MAX_BODY = 1 << 30
+# Distinct license entries the server keeps resolved; past this, the entries and resolutions are dropped between requests
+SERVE_MAX_LICENSE_ENTRIES = 100000
+SERVE_FORMATS = ('text', 'html', 'virtual', 'json', 'license-texts', 'license-texts-html')
+
+# Incremental runs keep their state in this file inside --state-dir
+STATE_FILE = "run_state.json"
+STATE_COMPONENTS_DIR = "components"
+STATE_SUMMARIES_FILE = "summaries.json"
+STATE_FORMAT = 1
+DIFF_FILE = "license_diff.json"
+
+# License policy, see LicensePolicy
+POLICY_STATUSES = ('allow', 'review', 'deny')
+POLICY_FAILURE_EXIT_CODE = 1
+VIOLATIONS_FILE = "license_violations.json"
+
+# Batch mode, see run_batch
+BATCH_INDEX_FILE = "projects_license_index.json"
+
+# Content-addressed license text store, see write_license_text_store
+LICENSE_TEXTS_INDEX_FILE = "index.json"
+LICENSE_TEXTS_COMPRESSIONS = {'gzip': '.gz', 'brotli': '.br'}
 
 LICENSE_NAME_TO_ID_MAP = {}
+LICENSE_INDEX = None
+EXPRESSION_CACHE = OrderedDict()
+EXPRESSION_CACHE_LOCK = threading.Lock()
+# Canonical JSON of every distinct SBOM license entry, shared by all components that use it
+LICENSE_ENTRIES = {}
+LICENSE_RESOLUTIONS = {}
+FETCH_SETTINGS = {
+    'backend': 'threads',
+    'workers': FETCH_WORKERS,
+    'timeout': REQUEST_TIMEOUT,
+    'retries': FETCH_RETRIES,
+}
+RESOLVE_SETTINGS = {
+    'executor': 'serial',
+    'workers': os.cpu_count() or 1,
+    'chunk_size': RESOLVE_CHUNK_SIZE,
+}
+# Lookup tables read by resolver workers; forked workers inherit them instead of receiving a pickled copy
+RESOLVER_TABLES = {}
+BATCH_PROJECTS = []
+HTTP_SESSION = None
+HTTP_SESSION_LOCK = threading.Lock()
+CACHE_SETTINGS = {
+    'dir': CACHE_DIR,
+    'ttl': CACHE_TTL,
+    'offline': False,
+    'refresh': False,
+    'version': 'main',
+}
+
+class Metrics:
+    """Stage timers, counters, HTTP latencies and errors of one run, optionally with Chrome trace events.
+
+    Counter names are dotted, e.g. 'cache.hit', and are grouped by their first part in the metrics file.
+    """
+
+    def __init__(self, trace=False):
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.timers = {}
+        self.counters = {}
+        self.http_latencies = []
+        self.error_messages = []
+        self.trace_events = [] if trace else None
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_span(self, name, started, seconds, category):
+        if self.trace_events is not None:
+            with self.lock:
+                self.trace_events.append({
+                    'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'ts': round((started - self.origin) * 1e6, 1), 'dur': round(seconds * 1e6, 1),
+                })
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a top-level stage of the run; repeated stages add up."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.add_span(name, started, seconds, 'stage')
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Time one of many repeated operations, e.g. parsing one SBOM file."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                count, total = self.timers.get(name, (0, 0.0))
+                self.timers[name] = (count + 1, total + seconds)
+            self.add_span(name, started, seconds, 'operation')
+
+    def record_http(self, url, seconds, status):
+        with self.lock:
+            self.http_latencies.append(seconds)
+            self.counters['http.requests'] = self.counters.get('http.requests', 0) + 1
+            self.counters[f'http.status_{status}'] = self.counters.get(f'http.status_{status}', 0) + 1
+        self.add_span(url, time.perf_counter() - seconds, seconds, 'http')
+
+    def error(self, kind, message):
+        print(message)
+        with self.lock:
+            self.counters[f'errors.{kind}'] = self.counters.get(f'errors.{kind}', 0) + 1
+            if len(self.error_messages) < METRICS_ERROR_MESSAGES:
+                self.error_messages.append({'kind': kind, 'message': message})
+
+    def latency_summary(self, latencies=None):
+        """Percentiles and a histogram of the run's HTTP latencies, or of the given subset of them."""
+        latencies = sorted(self.http_latencies if latencies is None else latencies)
+        if not latencies:
+            return {}
+        percentile = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+        buckets = {f"le_{bound}ms": 0 for bound in HTTP_LATENCY_BUCKETS}
+        buckets['inf'] = 0
+        for latency in latencies:
+            bucket = next((f"le_{bound}ms" for bound in HTTP_LATENCY_BUCKETS if latency * 1000 <= bound), 'inf')
+            buckets[bucket] += 1
+        return {'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99), 'max_ms': round(latencies[-1] * 1000, 1), 'histogram': buckets}
+
+    def to_dict(self):
+        groups = {}
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                group, _, counter = name.partition('.')
+                groups.setdefault(group, {})[counter or group] = value
+            metrics = {
+                'total_seconds': round(time.perf_counter() - self.origin, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'timers': {name: {'count': count, 'seconds': round(total, 4)} for name, (count, total) in self.timers.items()},
+            }
+        metrics.update(groups)
+        metrics.setdefault('http', {})['latency'] = self.latency_summary()
+        metrics['error_messages'] = list(self.error_messages)
+        return metrics
 
-def fetch_data(url):
+    def chrome_trace(self):
+        return {'traceEvents': list(self.trace_events or []), 'displayTimeUnit': 'ms'}
+
+METRICS = Metrics()
+
+def timed_iter(name, iterable):
+    # Times how long each item takes to arrive, e.g. waiting for a worker process to parse a file
+    iterator = iter(iterable)
+    while True:
+        with METRICS.timed(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def get_http_session():
+    global HTTP_SESSION
+    with HTTP_SESSION_LOCK:
+        if HTTP_SESSION is None:
+            retry = Retry(
+                total=FETCH_SETTINGS['retries'],
+                backoff_factor=0.5,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(['GET']),
+            )
+            # One pooled connection per worker keeps every download on a kept-alive connection
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_SETTINGS['workers'], max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            HTTP_SESSION = session
+        return HTTP_SESSION
+
+def spdx_version_tag(version):
+    if not version or version == 'main':
+        return 'main'
+    return version if version.startswith('v') else f"v{version}"
+
+def spdx_data_urls(version):
+    tag = spdx_version_tag(version)
+    if tag == 'main':
+        return LICENSES_URL, EXCEPTIONS_URL
+    base_url = SPDX_DATA_URL.format(version=tag)
+    return base_url + "licenses.json", base_url + "exceptions.json"
+
+def pinned_details_url(version, item_id, is_exception=False):
+    tag = spdx_version_tag(version)
+    if tag == 'main':
+        return None
+    folder = "exceptions" if is_exception else "details"
+    return SPDX_DATA_URL.format(version=tag) + f"{folder}/{item_id}.json"
+
+def cache_entry_paths(url):
+    cache_dir = os.path.join(CACHE_SETTINGS['dir'], spdx_version_tag(CACHE_SETTINGS['version']))
+    name = os.path.basename(url.split('?', 1)[0]) or "index"
+    key = f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}-{name}"
+    return os.path.join(cache_dir, key), os.path.join(cache_dir, key + ".meta")
+
+def read_cache_entry(url):
+    if not CACHE_SETTINGS['dir']:
+        return None, None
+    body_path, meta_path = cache_entry_paths(url)
+    try:
+        with open(meta_path, 'r') as meta_file:
+            meta = json.load(meta_file)
+        with open(body_path, 'r') as body_file:
+            return json.load(body_file), meta
+    except (OSError, ValueError):
+        return None, None
+
+def write_file_atomic(path, content):
+    """Write str or bytes content to path through a temporary file, so readers never see a partial file.
+
+    The temporary name is unique per process and thread, so concurrent writers of one path do not collide.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(content.encode('utf-8') if isinstance(content, str) else content)
+        os.replace(tmp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def write_cache_entry(url, data, meta):
+    if not CACHE_SETTINGS['dir']:
+        return
+    body_path, meta_path = cache_entry_paths(url)
+    try:
+        for path, content in ((body_path, data), (meta_path, meta)):
+            write_file_atomic(path, json.dumps(content))
+    except OSError as e:
+        METRICS.error('cache_write', f"Error writing cache entry for {url}: {e}")
+
+def is_cache_fresh(meta):
+    # A pinned license list version never changes, so its entries never expire
+    if spdx_version_tag(CACHE_SETTINGS['version']) != 'main':
+        return True
+    return time.time() - meta.get('fetched_at', 0) < CACHE_SETTINGS['ttl']
+
+def prepare_cached_fetch(url):
+    data, meta = read_cache_entry(url)
+    if data is not None and (CACHE_SETTINGS['offline'] or (not CACHE_SETTINGS['refresh'] and is_cache_fresh(meta))):
+        METRICS.count('cache.hit')
+        return data, meta, None
+    if data is None:
+        METRICS.count('cache.miss')
+    else:
+        METRICS.count('cache.refresh' if CACHE_SETTINGS['refresh'] else 'cache.revalidate')
+    if CACHE_SETTINGS['offline']:
+        raise LookupError(f"{url} is not in the cache and --offline is set")
+
+    headers = {}
+    if data is not None and not CACHE_SETTINGS['refresh']:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    return data, meta, headers
+
+def store_cached_json(url, data, meta):
+    meta['fetched_at'] = time.time()
+    write_cache_entry(url, data, meta)
+    return data
+
+def http_get(url, headers):
+    started = time.perf_counter()
     try:
-        response = requests.get(url)
+        response = get_http_session().get(url, headers=headers, timeout=FETCH_SETTINGS['timeout'])
+    except requests.exceptions.RequestException:
+        METRICS.record_http(url, time.perf_counter() - started, 'error')
+        raise
+    METRICS.record_http(url, time.perf_counter() - started, response.status_code)
+    return response
+
+def fetch_cached_json(url):
+    data, meta, headers = prepare_cached_fetch(url)
+    if headers is None:
+        return data
+
+    try:
+        response = http_get(url, headers)
+        if response.status_code == 304 and data is not None:
+            METRICS.count('cache.not_modified')
+            return store_cached_json(url, data, meta)
         response.raise_for_status()
-        return response.json()
+        fresh_data = response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from {url}: {e}")
-        return {}
+        if data is None:
+            raise
+        METRICS.error('revalidate', f"Error revalidating {url}, using cached copy: {e}")
+        return data
+
+    return store_cached_json(url, fresh_data, {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+
+class SPDXDataError(Exception):
+    """The SPDX license or exception list is unavailable where a degraded report must not be written."""
+
+class AsyncHTTPError(Exception):
+    pass
+
+class AsyncConnectionPool:
+    """Minimal HTTP/1.1 GET client on asyncio streams that keeps idle connections alive per host."""
+
+    def __init__(self, limit_per_host, timeout):
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.idle = {}
+        self.host_limits = {}
+        self.ssl_context = ssl.create_default_context()
+
+    async def get(self, url, headers):
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        port = parts.port or (443 if secure else 80)
+        host_key = (parts.scheme, parts.hostname, port)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        limit = self.host_limits.setdefault(host_key, asyncio.Semaphore(self.limit_per_host))
+
+        async with limit:
+            for attempt in range(2):
+                reused, connection = await self.acquire(host_key, secure)
+                try:
+                    status, response_headers, body, keep_alive = await asyncio.wait_for(
+                        self.exchange(connection, parts.netloc, target, headers), self.timeout)
+                except (ConnectionError, EOFError):
+                    connection[1].close()
+                    # The server may have dropped an idle kept-alive connection; retry once on a new one
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    connection[1].close()
+                    raise
+                if keep_alive:
+                    self.idle.setdefault(host_key, []).append(connection)
+                else:
+                    connection[1].close()
+                return status, response_headers, body
+
+    async def acquire(self, host_key, secure):
+        idle = self.idle.get(host_key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return True, (reader, writer)
+            writer.close()
+        _, host, port = host_key
+        connection = await asyncio.wait_for(asyncio.open_connection(
+            host, port, ssl=self.ssl_context if secure else None, server_hostname=host if secure else None), self.timeout)
+        return False, connection
+
+    async def exchange(self, connection, host, target, headers):
+        reader, writer = connection
+        request_lines = [f"GET {target} HTTP/1.1", f"Host: {host}", "Accept: application/json",
+                         "Accept-Encoding: gzip", "Connection: keep-alive"]
+        request_lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        version, status, *_ = status_line.decode('latin-1').split(None, 2)
+        status = int(status)
+
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and response_headers.get('connection', '').lower() != 'close'
+        if status in (204, 304):
+            body = b''
+        elif 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            body = await read_chunked_body(reader)
+        elif 'content-length' in response_headers:
+            body = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        if response_headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return status, response_headers, body, keep_alive
+
+    async def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+async def read_chunked_body(reader):
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b';', 1)[0].strip(), 16)
+        if size == 0:
+            # Skip optional trailers up to the terminating blank line
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+async def async_http_get(pool, url, headers, latencies):
+    redirects = 0
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            status, response_headers, body = await pool.get(url, headers)
+        except (OSError, EOFError, asyncio.TimeoutError, ValueError) as e:
+            METRICS.record_http(url, time.perf_counter() - started, 'error')
+            error = e
+        else:
+            latencies.append(time.perf_counter() - started)
+            METRICS.record_http(url, latencies[-1], status)
+            if status in (301, 302, 303, 307, 308) and 'location' in response_headers and redirects < 5:
+                redirects += 1
+                url = urljoin(url, response_headers['location'])
+                continue
+            if status not in RETRY_STATUSES:
+                return status, response_headers, body
+            error = AsyncHTTPError(f"{status} Error for url: {url}")
+
+        if attempt >= FETCH_SETTINGS['retries']:
+            raise error
+        # Jittered exponential backoff so retries from many concurrent requests do not line up
+        await asyncio.sleep(0.5 * (2 ** attempt) * random.uniform(0.5, 1.5))
+        attempt += 1
+
+async def fetch_cached_json_async(pool, url, latencies):
+    data, meta, headers = prepare_cached_fetch(url)
+    if headers is None:
+        return data
+
+    try:
+        status, response_headers, body = await async_http_get(pool, url, headers, latencies)
+        if status == 304 and data is not None:
+            METRICS.count('cache.not_modified')
+            return store_cached_json(url, data, meta)
+        if status >= 400:
+            raise AsyncHTTPError(f"{status} Error for url: {url}")
+        fresh_data = json.loads(body)
+    # ValueError covers a malformed body, which the threads backend also falls back on
+    except (OSError, EOFError, asyncio.TimeoutError, AsyncHTTPError, ValueError) as e:
+        if data is None:
+            raise
+        METRICS.error('revalidate', f"Error revalidating {url}, using cached copy: {e}")
+        return data
+
+    return store_cached_json(url, fresh_data, {
+        'url': url,
+        'etag': response_headers.get('etag'),
+        'last_modified': response_headers.get('last-modified'),
+    })
+
+async def fetch_documents_async(urls, handler):
+    pool = AsyncConnectionPool(FETCH_SETTINGS['workers'], FETCH_SETTINGS['timeout'])
+    limit = asyncio.Semaphore(FETCH_SETTINGS['workers'])
+    latencies = []
+
+    async def fetch_one(url):
+        async with limit:
+            try:
+                return handler(url, await fetch_cached_json_async(pool, url, latencies), None)
+            except (OSError, EOFError, asyncio.TimeoutError, AsyncHTTPError, LookupError, ValueError) as e:
+                return handler(url, None, e)
+
+    try:
+        results = await asyncio.gather(*(fetch_one(url) for url in urls))
+    finally:
+        await pool.close()
+    report_fetch_latencies(latencies)
+    return dict(zip(urls, results))
 
-def load_sbom_files(directory):
+def report_fetch_latencies(latencies):
+    summary = METRICS.latency_summary(latencies)
+    if summary:
+        print(f"Fetched {len(latencies)} SPDX documents: p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, max {summary['max_ms']:.0f} ms")
+
+def fetch_data(url):
+    if FETCH_SETTINGS['backend'] == 'async':
+        return asyncio.run(fetch_documents_async([url], fetch_data_result))[url]
+    try:
+        return fetch_cached_json(url)
+    except (requests.exceptions.RequestException, LookupError, ValueError) as e:
+        return fetch_data_result(url, None, e)
+
+def fetch_data_result(url, data, error):
+    if error is not None:
+        METRICS.error('fetch', f"Error fetching data from {url}: {error}")
+        return {}
+    return data
+
+def list_sbom_files(directory):
+    # Sorted so that the first occurrence of a duplicated component wins in a deterministic order
+    return [os.path.join(directory, sbom_file) for sbom_file in sorted(os.listdir(directory)) if sbom_file.endswith(SBOM_EXTENSIONS)]
+
+def open_sbom_file(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+def iter_components(components):
+    # CycloneDX allows components to nest sub-components to any depth
+    for component in components:
+        yield component
+        yield from iter_components(component.get("components", []))
+
+def project_component(component):
+    return {field: component[field] for field in COMPONENT_FIELDS if field in component}
+
+def component_key(component):
+    return f"{component['group']}:{component['name']}:{component['version']}"
+
+class ComponentRecord:
+    """Compact component with interned strings and shared license entries."""
+
+    __slots__ = ('group', 'name', 'version', 'licenses', 'vcs_url')
+
+    def __init__(self, group, name, version, licenses, vcs_url):
+        self.group = group
+        self.name = name
+        self.version = version
+        self.licenses = licenses
+        self.vcs_url = vcs_url
+
+class ResolvedLicense:
+    """Resolution and report items of one distinct SBOM license entry."""
+
+    __slots__ = ('entry_key', 'license_ids', 'license_names', 'license_references', 'exceptions', 'items', 'text')
+
+    def __init__(self, entry_key, license_ids, license_names, license_references, exceptions, items, text):
+        self.entry_key = entry_key
+        self.license_ids = license_ids
+        self.license_names = license_names
+        self.license_references = license_references
+        self.exceptions = exceptions
+        self.items = items
+        self.text = text
+
+class ComponentRow:
+    """Report row of one component, rendered by the text and HTML writers."""
+
+    __slots__ = ('group', 'name', 'version', 'licenses', 'vcs_url')
+
+    def __init__(self, group, name, version, licenses, vcs_url):
+        self.group = group
+        self.name = name
+        self.version = version
+        self.licenses = licenses
+        self.vcs_url = vcs_url
+
+def intern_value(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def intern_license_entry(license):
+    # The canonical JSON doubles as the entry's identity, so equal entries share one key and one dict
+    entry_key = sys.intern(json.dumps(license, sort_keys=True, separators=(',', ':')))
+    LICENSE_ENTRIES.setdefault(entry_key, license)
+    return entry_key
+
+def make_component_record(component):
+    return ComponentRecord(
+        intern_value(component['group']),
+        component['name'],
+        intern_value(component['version']),
+        tuple(intern_license_entry(license) for license in component.get('licenses', [])),
+        intern_value(extract_vcs_url(component)),
+    )
+
+def load_sbom_file(sbom_path, streaming=False, project=False):
     components = {}
-    for sbom_file in os.listdir(directory):
-        if sbom_file.endswith(".json"):
-            with open(os.path.join(directory, sbom_file), "r") as file:
-                sbom_data = json.load(file)
-                for component in sbom_data.get("components", []):
-                    component_key = f"{component['group']}:{component['name']}:{component['version']}"
-                    if component_key not in components:
-                        components[component_key] = component
-    return components
+    with open_sbom_file(sbom_path) as file:
+        if streaming:
+            sbom_components = iter_components(stream_json_array(file, "components"))
+        else:
+            sbom_components = iter_components(json.load(file).get("components", []))
+        for component in sbom_components:
+            key = component_key(component)
+            if key not in components:
+                components[key] = project_component(component) if streaming or project else component
+    return list(components.items())
+
+def iter_sbom_components(directory, streaming=False, workers=1):
+    """Yield (key, ComponentRecord) pairs for the first occurrence of every component, in file name order.
+
+    With more than one worker, files are parsed in a process pool and merged in the same order
+    as the sequential loader, so components can be consumed while later files are still parsing.
+    """
+    sbom_paths = list_sbom_files(directory)
+    METRICS.count('counts.sbom_files', len(sbom_paths))
+    seen = set()
+    if workers > 1 and len(sbom_paths) > 1:
+        chunk_size = max(1, len(sbom_paths) // (workers * 8))
+        # Workers only return the projected fields, which keeps the results cheap to pickle
+        load = functools.partial(load_sbom_file, streaming=streaming, project=True)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_components in timed_iter('sbom_load', executor.map(load, sbom_paths, chunksize=chunk_size)):
+                for key, component in file_components:
+                    if key not in seen:
+                        seen.add(key)
+                        yield key, make_component_record(component)
+        return
+
+    for sbom_path in sbom_paths:
+        with METRICS.timed('sbom_load'):
+            file_components = load_sbom_file(sbom_path, streaming)
+        for key, component in file_components:
+            if key not in seen:
+                seen.add(key)
+                yield key, make_component_record(component)
+
+def state_entry_path(state_dir, name):
+    return os.path.join(state_dir, name)
+
+def read_state_json(path, default):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+def write_state_json(path, data):
+    try:
+        # An interrupted run never leaves a partial entry
+        write_file_atomic(path, json.dumps(data, separators=(',', ':')))
+    except OSError as e:
+        METRICS.error('state_write', f"Error writing run state to {path}: {e}")
+
+def load_run_state(state_dir):
+    state = read_state_json(state_entry_path(state_dir, STATE_FILE), {})
+    # State written by another format version is discarded and rebuilt from scratch
+    if state.get('format') != STATE_FORMAT:
+        state = {'format': STATE_FORMAT}
+    return state
+
+def save_run_state(state_dir, state):
+    write_state_json(state_entry_path(state_dir, STATE_FILE), state)
+    # Component lists are stored by content hash; drop the ones no SBOM file refers to any more
+    current = {entry['sha256'] + ".json" for entry in state.get('files', {}).values()}
+    components_dir = state_entry_path(state_dir, STATE_COMPONENTS_DIR)
+    try:
+        for name in os.listdir(components_dir):
+            if name not in current:
+                os.remove(os.path.join(components_dir, name))
+    except OSError:
+        pass
+
+def state_components_path(state_dir, content_hash):
+    return os.path.join(state_entry_path(state_dir, STATE_COMPONENTS_DIR), content_hash + ".json")
+
+def file_content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(STREAM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def refresh_sbom_state(directory, state_dir, state, streaming=False, workers=1):
+    """Bring the SBOM file table of an incremental run state up to date with the directory.
+
+    Files with the stored size and modification time are trusted as is; otherwise the SHA-256 of
+    the content decides, so a fresh checkout that only touched the files parses nothing. Only
+    changed and new files are parsed, and their projected components are stored under their
+    content hash. Returns the changed and removed file paths, and the ones whose content was
+    re-hashed but found unchanged.
+    """
+    previous_files = state.get('files', {})
+    files = {}
+    changed_paths = []
+    rehashed_paths = []
+    parse_paths = []
+    parse_hashes = set()
+    for sbom_path in list_sbom_files(directory):
+        path_key = os.path.abspath(sbom_path)
+        file_stat = os.stat(sbom_path)
+        entry = previous_files.get(path_key)
+        if entry and entry['size'] == file_stat.st_size and entry['mtime_ns'] == file_stat.st_mtime_ns:
+            files[path_key] = entry
+            content_hash = entry['sha256']
+        else:
+            with METRICS.timed('sbom_hash'):
+                content_hash = file_content_hash(sbom_path)
+            files[path_key] = {'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns, 'sha256': content_hash}
+        # A file whose stored components were lost counts as changed, so it is parsed again
+        if entry and entry['sha256'] == content_hash and os.path.exists(state_components_path(state_dir, content_hash)):
+            if files[path_key] is not entry:
+                rehashed_paths.append(path_key)
+            continue
+        changed_paths.append(path_key)
+        # Content seen before, e.g. a renamed or reverted SBOM, does not need parsing again
+        if not os.path.exists(state_components_path(state_dir, content_hash)) and content_hash not in parse_hashes:
+            parse_hashes.add(content_hash)
+            parse_paths.append(path_key)
+
+    load = functools.partial(load_sbom_file, streaming=streaming, project=True)
+    if workers > 1 and len(parse_paths) > 1:
+        chunk_size = max(1, len(parse_paths) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(load, parse_paths, chunksize=chunk_size)
+            for path_key, file_components in zip(parse_paths, timed_iter('sbom_load', parsed)):
+                write_state_json(state_components_path(state_dir, files[path_key]['sha256']), file_components)
+    else:
+        for path_key in parse_paths:
+            with METRICS.timed('sbom_load'):
+                file_components = load(path_key)
+            write_state_json(state_components_path(state_dir, files[path_key]['sha256']), file_components)
+
+    METRICS.count('counts.sbom_files', len(files))
+    METRICS.count('counts.sbom_files_parsed', len(parse_paths))
+    removed_paths = [path_key for path_key in previous_files if path_key not in files]
+    state['files'] = files
+    return {'changed': changed_paths, 'removed': removed_paths, 'rehashed': rehashed_paths}
+
+def iter_state_components(state_dir, state, streaming=False):
+    """Yield (key, ComponentRecord) pairs from the stored SBOM files, with the same precedence as iter_sbom_components.
+
+    A file whose stored components are missing or unreadable is parsed again and its entry rewritten,
+    since its unchanged size and modification time would otherwise never get it re-parsed.
+    """
+    seen = set()
+    for path_key, entry in state.get('files', {}).items():
+        components_path = state_components_path(state_dir, entry['sha256'])
+        file_components = read_state_json(components_path, None)
+        if not isinstance(file_components, list):
+            METRICS.error('state_read', f"Stored components of {path_key} are missing or unreadable, parsing it again")
+            with METRICS.timed('sbom_load'):
+                file_components = load_sbom_file(path_key, streaming, project=True)
+            write_state_json(components_path, file_components)
+        for key, component in file_components:
+            if key not in seen:
+                seen.add(key)
+                yield key, make_component_record(component)
+
+class JSONStream:
+    """Incremental reader for a JSON document that decodes one value at a time from a text file."""
+
+    def __init__(self, file, chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        # Grow reads with the pending data so re-decoding a large value stays linear overall
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer) - self.position))
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        while True:
+            self.position = JSON_WHITESPACE_PATTERN.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{self.peek()}'")
+        self.position += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the buffer end may continue in the next chunk, also if the chunk ends in its '.' or 'e'
+            if not self.eof and JSON_NUMBER_TAIL_PATTERN.fullmatch(self.buffer, end) and self.fill():
+                continue
+            self.position = end
+            return value
+
+def stream_json_array(file, key):
+    """Yield the items of the array stored under `key` in the top-level JSON object one at a time."""
+    stream = JSONStream(file)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        name = stream.decode()
+        stream.expect(":")
+        if name == key and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                return
+            while True:
+                yield stream.decode()
+                if stream.peek() == "]":
+                    # Nothing after the array is needed, so stop without reading the rest of the file
+                    return
+                stream.expect(",")
+        stream.decode()
+        if stream.peek() == "}":
+            return
+        stream.expect(",")
 
 def load_license_name_to_id_map(json_file):
     if not json_file:
@@ -41,9 +922,190 @@ def load_license_name_to_id_map(json_file):
         with open(json_file, 'r') as file:
             return json.load(file)
     except Exception as e:
-        print(f"Error loading mapping file: {e}")
+        METRICS.error('mapping', f"Error loading mapping file: {e}")
         return {}
 
+def build_licenses_lookup(licenses_data, version='main'):
+    licenses_lookup = {}
+    for license in licenses_data:
+        details_url = pinned_details_url(version, license['licenseId'])
+        licenses_lookup[license['licenseId']] = dict(license, detailsUrl=details_url) if details_url else license
+    return licenses_lookup
+
+def build_exceptions_lookup(exceptions_data, version='main'):
+    # The SPDX exceptions list swaps 'reference' and 'detailsUrl' compared to the licenses list
+    return {
+        exception['licenseExceptionId'].lower(): {
+            'name': exception.get('name', ''),
+            'reference': resolve_relative_url('https://spdx.org/licenses/', exception.get('detailsUrl', '')),
+            'detailsUrl': pinned_details_url(version, exception['licenseExceptionId'], is_exception=True)
+                or resolve_relative_url('https://spdx.org/licenses/', exception.get('reference', ''))
+        } for exception in exceptions_data
+    }
+
+def normalize_license_name(name):
+    name = LICENSE_NAME_VERSION_PREFIX_PATTERN.sub('', name.lower().replace('licence', 'license'))
+    tokens = []
+    for token in LICENSE_NAME_TOKEN_PATTERN.findall(name):
+        if token in LICENSE_NAME_STOP_WORDS:
+            continue
+        if token[0].isdigit():
+            # '2', '2.0' and '2.0.0' are the same version
+            token = re.sub(r'(\.0)+$', '', token)
+        tokens.append(token)
+    return ' '.join(tokens)
+
+def license_name_trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LicenseIndex:
+    """Lookup tables for license and exception IDs, license names and mapping names, compiled once per run.
+
+    IDs are matched case-insensitively and deprecated IDs are aliased to their current equivalent,
+    e.g. 'GPL-2.0' to 'GPL-2.0-only' and 'GPL-2.0+' to 'GPL-2.0-or-later'. Names are matched after
+    normalize_license_name, and a trigram index suggests IDs for names that match nothing.
+    """
+
+    def __init__(self, license_ids, exception_ids, names, mapped_names, normalized_mapped_names, candidates, trigrams):
+        self.license_ids = license_ids
+        self.exception_ids = exception_ids
+        self.names = names
+        self.mapped_names = mapped_names
+        self.normalized_mapped_names = normalized_mapped_names
+        self.candidates = candidates
+        self.trigrams = trigrams
+        self.tables = None
+
+    @classmethod
+    def build(cls, licenses_lookup, exceptions_lookup, name_to_id_map):
+        license_ids = {}
+        names = {}
+        # Current IDs go first, so they win name collisions with the deprecated IDs they replace
+        for license_id, license in sorted(licenses_lookup.items(), key=lambda item: bool(item[1].get('isDeprecatedLicenseId'))):
+            license_ids.setdefault(license_id.lower(), license_id)
+            names.setdefault(normalize_license_name(license.get('name', '')), license_id)
+        for license_id, license in licenses_lookup.items():
+            if not license.get('isDeprecatedLicenseId'):
+                continue
+            if license_id.endswith('+'):
+                successor = f"{license_id[:-1]}-or-later"
+            else:
+                successor = f"{license_id}-only"
+            if successor in licenses_lookup:
+                license_ids[license_id.lower()] = successor
+
+        exception_ids = {exception_id.lower(): exception_id for exception_id in exceptions_lookup}
+        for exception_id, exception in exceptions_lookup.items():
+            names.setdefault(normalize_license_name(exception.get('name', '')), exception_id)
+        names.pop('', None)
+
+        normalized_mapped_names = {}
+        for name, mapped_ids in name_to_id_map.items():
+            normalized_mapped_names.setdefault(normalize_license_name(name), mapped_ids)
+
+        candidates = sorted({(normalize_license_name(license_id), license_id) for license_id in licenses_lookup} | {(name, license_id) for name, license_id in names.items()})
+        trigrams = {}
+        for position, (text, _) in enumerate(candidates):
+            for trigram in license_name_trigrams(text):
+                trigrams.setdefault(trigram, []).append(position)
+
+        # Each candidate keeps its trigram count, so scoring a match needs no set operations
+        candidates = [[text, license_id, len(license_name_trigrams(text))] for text, license_id in candidates]
+        return cls(license_ids, exception_ids, names, dict(name_to_id_map), normalized_mapped_names, candidates, trigrams)
+
+    def to_dict(self):
+        return {
+            'license_ids': self.license_ids,
+            'exception_ids': self.exception_ids,
+            'names': self.names,
+            'mapped_names': self.mapped_names,
+            'normalized_mapped_names': self.normalized_mapped_names,
+            'candidates': self.candidates,
+            'trigrams': self.trigrams,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['license_ids'], data['exception_ids'], data['names'], data['mapped_names'],
+                   data['normalized_mapped_names'], data['candidates'], data['trigrams'])
+
+    def license_id(self, license_id):
+        """Return the current SPDX ID for an ID in any case, or None if the license list does not know it."""
+        canonical = self.license_ids.get(license_id.lower())
+        if canonical is None and license_id.endswith('+'):
+            # 'X+' means 'X or later': prefer the explicit -or-later ID, then plain X
+            base = self.license_ids.get(license_id[:-1].lower())
+            if base is not None:
+                stem = base[:-len('-only')] if base.endswith('-only') else base
+                canonical = self.license_ids.get(f"{stem}-or-later".lower(), base)
+        return canonical
+
+    def exception_key(self, exception_id):
+        return self.exception_ids.get(exception_id.lower())
+
+    def mapped_ids(self, name):
+        """Return the mapping file entry for a license name, matched exactly or after normalization."""
+        mapped_ids = self.mapped_names.get(name)
+        if mapped_ids is None:
+            mapped_ids = self.normalized_mapped_names.get(normalize_license_name(name))
+        return mapped_ids
+
+    def match_name(self, name):
+        return self.names.get(normalize_license_name(name))
+
+    def suggest(self, name, limit=SUGGESTION_LIMIT):
+        """Return up to limit (ID, score) pairs whose names or IDs look like name, best first."""
+        query = license_name_trigrams(normalize_license_name(name))
+        shared = {}
+        for trigram in query:
+            for position in self.trigrams.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        scores = {}
+        for position, count in shared.items():
+            _, license_id, size = self.candidates[position]
+            score = 2 * count / (len(query) + size)
+            if score >= SUGGESTION_MIN_SCORE and score > scores.get(license_id, 0):
+                scores[license_id] = score
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+def license_index_cache_path(fingerprint):
+    cache_dir = os.path.join(CACHE_SETTINGS['dir'], spdx_version_tag(CACHE_SETTINGS['version']))
+    return os.path.join(cache_dir, f"index-{fingerprint[:16]}.json")
+
+def load_license_index(licenses_lookup, exceptions_lookup):
+    """Load the compiled license index for these lookups and the mapping from the cache, or build and cache it."""
+    global LICENSE_INDEX
+    index = None
+    path = None
+    if CACHE_SETTINGS['dir']:
+        path = license_index_cache_path(resolution_fingerprint(licenses_lookup, exceptions_lookup))
+        try:
+            with open(path, 'r') as file:
+                index = LicenseIndex.from_dict(json.load(file))
+        except (OSError, ValueError, KeyError):
+            index = None
+    if index is None:
+        index = LicenseIndex.build(licenses_lookup, exceptions_lookup, LICENSE_NAME_TO_ID_MAP)
+        if path:
+            try:
+                write_file_atomic(path, json.dumps(index.to_dict(), separators=(',', ':')))
+            except OSError as e:
+                METRICS.error('cache_write', f"Error writing license index to {path}: {e}")
+    index.tables = (licenses_lookup, exceptions_lookup)
+    LICENSE_INDEX = index
+    return index
+
+def get_license_index(licenses_lookup, exceptions_lookup):
+    global LICENSE_INDEX
+    index = LICENSE_INDEX
+    if index is None or index.tables is None or index.tables[0] is not licenses_lookup or index.tables[1] is not exceptions_lookup:
+        # Built on first use when the caller did not load one, e.g. in spawned resolver workers
+        index = LicenseIndex.build(licenses_lookup, exceptions_lookup, LICENSE_NAME_TO_ID_MAP)
+        index.tables = (licenses_lookup, exceptions_lookup)
+        LICENSE_INDEX = index
+    return index
+
 def extract_vcs_url(component):
     external_references = component.get("externalReferences", [])
     for reference in external_references:
@@ -65,54 +1127,108 @@ def get_license_reference_url(license_id, licenses_lookup, exceptions_lookup):
 
 def get_full_license_text(details_url, is_exception=False):
     try:
-        response = requests.get(details_url)
-        response.raise_for_status()
-        license_data = response.json()
-        if is_exception:
-            return license_data.get('licenseExceptionText', ''), license_data.get('exceptionTextHtml', '')
-        return license_data.get('licenseText', ''), license_data.get('licenseTextHtml', '')
-    except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
-        print(f"Error fetching license details from {details_url}: {e}")
+        return extract_license_text(fetch_cached_json(details_url), is_exception)
+    except (requests.exceptions.RequestException, LookupError, ValueError) as e:
+        METRICS.error('license_text', f"Error fetching license details from {details_url}: {e}")
         return '', ''
 
-def process_individual_license(license, licenses_lookup, license_texts, exceptions_lookup):
+def extract_license_text(license_data, is_exception=False):
+    if is_exception:
+        return license_data.get('licenseExceptionText', ''), license_data.get('exceptionTextHtml', '')
+    return license_data.get('licenseText', ''), license_data.get('licenseTextHtml', '')
+
+def get_full_license_texts_async(documents):
+    is_exception_by_url = dict(documents)
+
+    def license_text_result(details_url, license_data, error):
+        if error is not None:
+            METRICS.error('license_text', f"Error fetching license details from {details_url}: {error}")
+            return '', ''
+        return extract_license_text(license_data, is_exception_by_url[details_url])
+
+    texts = asyncio.run(fetch_documents_async(list(is_exception_by_url), license_text_result))
+    return {(details_url, is_exception): texts[details_url] for details_url, is_exception in documents}
+
+def collect_license_text_targets(components, licenses_lookup, exceptions_lookup):
+    targets = {}
+    seen_licenses = set()
+    for component in components.values():
+        add_license_text_targets(targets, seen_licenses, component, licenses_lookup, exceptions_lookup)
+    return targets
+
+def add_license_text_targets(targets, seen_licenses, component, licenses_lookup, exceptions_lookup):
+    for entry_key in component.licenses:
+        # Components share a small set of license entries, so resolve each distinct one once
+        if entry_key in seen_licenses:
+            continue
+        seen_licenses.add(entry_key)
+
+        resolved = resolve_license_entry(entry_key, licenses_lookup, exceptions_lookup)
+        license_ids, exceptions = resolved.license_ids, resolved.exceptions
+        for exception in exceptions:
+            details_url = exceptions_lookup[exception].get('detailsUrl', '')
+            if details_url and exception not in targets:
+                targets[exception] = (details_url, True)
+        exception_ids = set(exceptions)
+        for license_id in license_ids:
+            if license_id.lower() in exception_ids:
+                continue
+            details_url = licenses_lookup.get(license_id, {}).get('detailsUrl', '')
+            if details_url and license_id not in targets:
+                targets[license_id] = (details_url, False)
+
+def prefetch_license_texts(targets):
+    # Several IDs can share a details document; download every distinct URL exactly once
+    keys_by_url = {}
+    for key, (details_url, is_exception) in targets.items():
+        keys_by_url.setdefault((details_url, is_exception), []).append(key)
+
+    if FETCH_SETTINGS['backend'] == 'async':
+        results = get_full_license_texts_async(list(keys_by_url))
+    else:
+        with ThreadPoolExecutor(max_workers=FETCH_SETTINGS['workers']) as executor:
+            futures = {executor.submit(get_full_license_text, details_url, is_exception): (details_url, is_exception) for details_url, is_exception in keys_by_url}
+            results = {futures[future]: future.result() for future in as_completed(futures)}
+
+    fetched = {}
+    for document, (license_text, license_text_html) in results.items():
+        if license_text and license_text_html:
+            for key in keys_by_url[document]:
+                fetched[key] = {'text': license_text, 'html': license_text_html}
+
+    return {key: fetched[key] for key in targets if key in fetched}
+
+def process_individual_license(license, licenses_lookup, exceptions_lookup):
     license_ids = []
     license_names = []
     license_references = []
     exceptions = []
 
+    index = get_license_index(licenses_lookup, exceptions_lookup)
     license_id = license['license'].get('id', 'Unknown')
     license_name = license['license'].get('name', 'Unknown')
     license_url = license['license'].get('url', '')
 
-    mapped_ids = LICENSE_NAME_TO_ID_MAP.get(license_name, [license_id])
+    mapped_ids = index.mapped_ids(license_name)
+    if mapped_ids is None:
+        # A license given only by name may still carry the name of a listed license
+        mapped_ids = [license_id if license_id != 'Unknown' else index.match_name(license_name) or 'Unknown']
 
     for id in mapped_ids:
-        id_normalized = id.lower()
+        exception_key = index.exception_key(id)
 
-        if id_normalized in exceptions_lookup:
-            exception_data = exceptions_lookup[id_normalized]
-            exceptions.append(id_normalized)
-            details_url = exception_data.get('detailsUrl', '')
+        if exception_key is not None:
+            exception_data = exceptions_lookup[exception_key]
+            exceptions.append(exception_key)
             reference_url = exception_data.get('reference', '')
 
-            if id_normalized not in license_texts and details_url:
-                license_text, license_text_html = get_full_license_text(details_url, is_exception=True)
-                if license_text and license_text_html:
-                    license_texts[id_normalized] = {'text': license_text, 'html': license_text_html}
-
             license_ids.append(id)
             license_names.append(exception_data.get('name', 'Unknown'))
             license_references.append(reference_url if reference_url else 'No URL')
         else:
             if id != 'Unknown':
+                id = index.license_id(id) or id
                 reference_url = get_license_reference_url(id, licenses_lookup, exceptions_lookup)
-                details_url = licenses_lookup.get(id, {}).get('detailsUrl', "")
-
-                if id not in license_texts and details_url:
-                    license_text, license_text_html = get_full_license_text(details_url)
-                    if license_text and license_text_html:
-                        license_texts[id] = {'text': license_text, 'html': license_text_html}
 
                 license_ids.append(id)
                 license_names.append(licenses_lookup.get(id, {}).get('name', license_name))
@@ -124,62 +1240,148 @@ def process_individual_license(license, licenses_lookup, license_texts, exceptio
 
     return license_ids, license_names, license_references, exceptions
 
-def process_license_expression(license, licenses_lookup, license_texts, exceptions_lookup):
+def tokenize_license_expression(expression):
+    return EXPRESSION_TOKEN_PATTERN.findall(expression)
+
+def normalize_license_expression(expression):
+    return " ".join(token.upper() if token.upper() in EXPRESSION_OPERATORS else token for token in tokenize_license_expression(expression))
+
+@functools.lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def parse_license_expression(expression):
+    """Parse an SPDX license expression into a tuple AST.
+
+    Nodes are ('license', id, or_later), ('ref', id), ('with', license_node, exception_id),
+    ('and', children) and ('or', children). WITH binds tighter than AND, and AND tighter than OR.
+    Raises ValueError for expressions that do not follow the SPDX grammar.
+    """
+    tokens = tokenize_license_expression(expression)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise ValueError(f"Unexpected end of license expression: {expression}")
+        position += 1
+        return token
+
+    def parse_operands(operator, parse_operand):
+        operands = [parse_operand()]
+        while peek() is not None and peek().upper() == operator:
+            take()
+            operands.append(parse_operand())
+        return operands[0] if len(operands) == 1 else (operator.lower(), tuple(operands))
+
+    def parse_or():
+        return parse_operands('OR', parse_and)
+
+    def parse_and():
+        return parse_operands('AND', parse_with)
+
+    def parse_with():
+        node = parse_primary()
+        if peek() is not None and peek().upper() == 'WITH':
+            take()
+            exception_id = take()
+            if not LICENSE_ID_PATTERN.match(exception_id) or exception_id.endswith('+'):
+                raise ValueError(f"Invalid exception '{exception_id}' in license expression: {expression}")
+            if node[0] != 'license':
+                raise ValueError(f"WITH must follow a license ID in license expression: {expression}")
+            node = ('with', node, exception_id)
+        return node
+
+    def parse_primary():
+        token = take()
+        if token == '(':
+            node = parse_or()
+            if take() != ')':
+                raise ValueError(f"Unbalanced parentheses in license expression: {expression}")
+            return node
+        if token == ')' or token.upper() in EXPRESSION_OPERATORS:
+            raise ValueError(f"Unexpected '{token}' in license expression: {expression}")
+        if LICENSE_REF_PATTERN.match(token):
+            return ('ref', token)
+        if not LICENSE_ID_PATTERN.match(token):
+            raise ValueError(f"Invalid license ID '{token}' in license expression: {expression}")
+        if token.endswith('+'):
+            return ('license', token[:-1], True)
+        return ('license', token, False)
+
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected '{peek()}' in license expression: {expression}")
+    return node
+
+def license_expression_leaves(node):
+    kind = node[0]
+    if kind == 'license':
+        yield node[1] + ('+' if node[2] else '')
+    elif kind == 'ref':
+        yield node[1]
+    elif kind == 'with':
+        yield from license_expression_leaves(node[1])
+        yield node[2]
+    else:
+        for child in node[1]:
+            yield from license_expression_leaves(child)
+
+def license_expression_ids(expression):
+    try:
+        return list(license_expression_leaves(parse_license_expression(expression)))
+    except ValueError:
+        # Fall back to picking ID-like words out of expressions that are not valid SPDX
+        return [token for token in re.findall(r'\b([A-Za-z0-9\.\-]+)\b', expression) if token.lower() not in EXPRESSION_KEYWORDS]
+
+def resolve_license_expression(expression, licenses_lookup, exceptions_lookup):
+    cache_key = normalize_license_expression(expression)
+    with EXPRESSION_CACHE_LOCK:
+        resolved = EXPRESSION_CACHE.get(cache_key)
+        if resolved is not None:
+            EXPRESSION_CACHE.move_to_end(cache_key)
+            return resolved
+
     license_ids = []
     license_names = []
     license_references = []
     exceptions = []
 
-    expression = license['expression']
-    license_ids_in_expression = re.findall(r'\b([A-Za-z0-9\.\-]+)\b', expression)
-    for license_id in license_ids_in_expression:
-        license_id_normalized = license_id.lower()
-        if license_id_normalized in ['or', 'and', 'with', 'without', 'exception']:
-            continue
+    index = get_license_index(licenses_lookup, exceptions_lookup)
+    for license_id in license_expression_ids(expression):
+        exception_key = index.exception_key(license_id)
 
-        if license_id_normalized in exceptions_lookup:
-            exception_data = exceptions_lookup[license_id_normalized]
-            exceptions.append(license_id_normalized)
-            details_url = exception_data.get('detailsUrl', '')
+        if exception_key is not None:
+            exception_data = exceptions_lookup[exception_key]
+            exceptions.append(exception_key)
             reference_url = exception_data.get('reference', '')
 
-            if license_id_normalized not in license_texts and details_url:
-                license_text, license_text_html = get_full_license_text(details_url, is_exception=True)
-                if license_text and license_text_html:
-                    license_texts[license_id_normalized] = {'text': license_text, 'html': license_text_html}
-
             license_ids.append(license_id)
             license_names.append(exception_data.get('name', 'Unknown'))
             license_references.append(reference_url if reference_url else 'No URL')
         else:
+            # Unknown 'X+' IDs are reported as plain X
+            license_id = index.license_id(license_id) or (license_id[:-1] if license_id.endswith('+') else license_id)
             license_name = licenses_lookup.get(license_id, {}).get('name', 'Unknown')
-            mapped_ids = LICENSE_NAME_TO_ID_MAP.get(license_name, [license_id])
+            mapped_ids = index.mapped_ids(license_name)
+            if mapped_ids is None:
+                mapped_ids = [license_id]
 
             for id in mapped_ids:
-                id_normalized = id.lower()
-                if id_normalized in exceptions_lookup:
-                    exception_data = exceptions_lookup[id_normalized]
-                    exceptions.append(id_normalized)
-                    details_url = exception_data.get('detailsUrl', '')
+                exception_key = index.exception_key(id)
+                if exception_key is not None:
+                    exception_data = exceptions_lookup[exception_key]
+                    exceptions.append(exception_key)
                     reference_url = exception_data.get('reference', '')
 
-                    if id_normalized not in license_texts and details_url:
-                        license_text, license_text_html = get_full_license_text(details_url, is_exception=True)
-                        if license_text and license_text_html:
-                            license_texts[id_normalized] = {'text': license_text, 'html': license_text_html}
-
                     license_ids.append(id)
                     license_names.append(exception_data.get('name', 'Unknown'))
                     license_references.append(reference_url if reference_url else 'No URL')
                 else:
                     if id != 'Unknown':
+                        id = index.license_id(id) or id
                         reference_url = get_license_reference_url(id, licenses_lookup, exceptions_lookup)
-                        details_url = licenses_lookup.get(id, {}).get('detailsUrl', "")
-
-                        if id not in license_texts and details_url:
-                            license_text, license_text_html = get_full_license_text(details_url)
-                            if license_text and license_text_html:
-                                license_texts[id] = {'text': license_text, 'html': license_text_html}
 
                         license_ids.append(id)
                         license_names.append(licenses_lookup.get(id, {}).get('name', license_name))
@@ -189,54 +1391,58 @@ def process_license_expression(license, licenses_lookup, license_texts, exceptio
                         license_names.append(license_name)
                         license_references.append('No URL')
 
-    return license_ids, license_names, license_references, exceptions
-
-def process_license_name(license, licenses_lookup, license_texts, exceptions_lookup):
+    resolved = (tuple(license_ids), tuple(license_names), tuple(license_references), tuple(exceptions))
+    with EXPRESSION_CACHE_LOCK:
+        EXPRESSION_CACHE[cache_key] = resolved
+        if len(EXPRESSION_CACHE) > EXPRESSION_CACHE_SIZE:
+            EXPRESSION_CACHE.popitem(last=False)
+    return resolved
+
+def clear_resolution_cache():
+    global LICENSE_INDEX
+    LICENSE_INDEX = None
+    with EXPRESSION_CACHE_LOCK:
+        EXPRESSION_CACHE.clear()
+        LICENSE_RESOLUTIONS.clear()
+
+def process_license_expression(license, licenses_lookup, exceptions_lookup):
+    license_ids, license_names, license_references, exceptions = resolve_license_expression(license['expression'], licenses_lookup, exceptions_lookup)
+    return list(license_ids), list(license_names), list(license_references), list(exceptions)
+
+def process_license_name(license, licenses_lookup, exceptions_lookup):
     license_ids = []
     license_names = []
     license_references = []
     exceptions = []
 
+    index = get_license_index(licenses_lookup, exceptions_lookup)
     license_name = license['name']
-    mapped_data = LICENSE_NAME_TO_ID_MAP.get(license_name, ['Unknown'])
+    mapped_data = index.mapped_ids(license_name)
+    if mapped_data is None:
+        matched_id = index.match_name(license_name)
+        mapped_data = [matched_id] if matched_id else ['Unknown']
 
     if isinstance(mapped_data, list):
         for item in mapped_data:
-            item_normalized = item.lower()
-            if item_normalized in licenses_lookup:
-                reference_url = get_license_reference_url(item, licenses_lookup, exceptions_lookup)
-                details_url = licenses_lookup.get(item, {}).get('detailsUrl', "")
-
-                if item not in license_texts and details_url:
-                    license_text, license_text_html = get_full_license_text(details_url)
-                    if license_text and license_text_html:
-                        license_texts[item] = {'text': license_text, 'html': license_text_html}
+            canonical_id = index.license_id(item)
+            exception_key = index.exception_key(item)
+            if canonical_id is not None:
+                reference_url = get_license_reference_url(canonical_id, licenses_lookup, exceptions_lookup)
 
-                license_ids.append(item)
-                license_names.append(licenses_lookup.get(item, {}).get('name', license_name))
+                license_ids.append(canonical_id)
+                license_names.append(licenses_lookup[canonical_id].get('name', license_name))
                 license_references.append(reference_url if reference_url else 'No URL')
-            elif item_normalized in exceptions_lookup:
-                exception_data = exceptions_lookup[item_normalized]
-                exceptions.append(item_normalized)
-                details_url = exception_data.get('detailsUrl', '')
+            elif exception_key is not None:
+                exception_data = exceptions_lookup[exception_key]
+                exceptions.append(exception_key)
                 reference_url = exception_data.get('reference', '')
 
-                if item_normalized not in license_texts and details_url:
-                    license_text, license_text_html = get_full_license_text(details_url, is_exception=True)
-                    if license_text and license_text_html:
-                        license_texts[item_normalized] = {'text': license_text, 'html': license_text_html}
-
                 license_ids.append(item)
                 license_names.append(exception_data.get('name', 'Unknown'))
                 license_references.append(reference_url if reference_url else 'No URL')
     else:
+        mapped_data = index.license_id(mapped_data) or mapped_data
         reference_url = get_license_reference_url(mapped_data, licenses_lookup, exceptions_lookup)
-        details_url = licenses_lookup.get(mapped_data, {}).get('detailsUrl', "")
-
-        if mapped_data not in license_texts and details_url:
-            license_text, license_text_html = get_full_license_text(details_url)
-            if license_text and license_text_html:
-                license_texts[mapped_data] = {'text': license_text, 'html': license_text_html}
 
         license_ids.append(mapped_data)
         license_names.append(license_name)
@@ -244,87 +1450,369 @@ def process_license_name(license, licenses_lookup, license_texts, exceptions_loo
 
     return license_ids, license_names, license_references, exceptions
 
-def process_license(license, licenses_lookup, license_texts, exceptions_lookup):
+def process_license(license, licenses_lookup, exceptions_lookup):
     if 'license' in license:
-        return process_individual_license(license, licenses_lookup, license_texts, exceptions_lookup)
+        return process_individual_license(license, licenses_lookup, exceptions_lookup)
     elif 'expression' in license:
-        return process_license_expression(license, licenses_lookup, license_texts, exceptions_lookup)
+        return process_license_expression(license, licenses_lookup, exceptions_lookup)
     elif 'name' in license:
-        return process_license_name(license, licenses_lookup, license_texts, exceptions_lookup)
+        return process_license_name(license, licenses_lookup, exceptions_lookup)
     return [], [], [], []
 
 def format_license_info(license_ids, license_names, license_references, exceptions, exceptions_lookup):
-    formatted_licenses = []
-    formatted_licenses_html = []
+    """Return the report items of a resolved license entry as (kind, label, url) tuples."""
+    license_items = []
     exception_ids = {ex.lower() for ex in exceptions}  # Use a set for efficient lookup
 
     for license_id, license_name, license_reference_url in zip(license_ids, license_names, license_references):
         if license_id.lower() not in exception_ids:
-            if license_reference_url:
-                formatted_licenses.append(f"License: {license_id if license_id != 'Unknown' else license_name}, {license_reference_url}")
-                formatted_licenses_html.append(f'<li>License: {license_id if license_id != "Unknown" else license_name}, <a href="{license_reference_url}" target="_blank">{license_reference_url}</a></li>')
-            else:
-                formatted_licenses.append(f"License: {license_id if license_id != 'Unknown' else license_name}")
-                formatted_licenses_html.append(f'<li>License: {license_id if license_id != "Unknown" else license_name}</li>')
+            license_items.append(('License', license_id if license_id != 'Unknown' else license_name, license_reference_url))
 
     for exception in exceptions:
         exception_data = exceptions_lookup[exception.lower()]
-        reference_url = exception_data.get('reference', 'No URL')
-        formatted_licenses.append(f"Exception: {exception_data.get('name', 'Unknown')}, {reference_url}")
-        formatted_licenses_html.append(f'<li>Exception: {exception_data.get("name", "Unknown")}, <a href="{reference_url}" target="_blank">{reference_url}</a></li>')
-
-    formatted_licenses_text = "; ".join(formatted_licenses)
-    formatted_licenses_html_list = "".join(formatted_licenses_html)  # Only join the list items, no additional <ul> here
-
-    return formatted_licenses_text, formatted_licenses_html_list
-
-def process_component(key, component, licenses_lookup, license_texts, exceptions_lookup):
-    licenses_info = []
-    licenses_info_html = []
-
-    for license in component.get('licenses', []):
-        license_ids, license_names, license_references, exceptions = process_license(license, licenses_lookup, license_texts, exceptions_lookup)
-        license_info, license_info_html = format_license_info(license_ids, license_names, license_references, exceptions, exceptions_lookup)
-        licenses_info.append(license_info)
-        licenses_info_html.append(license_info_html)
-
-    vcs_url = extract_vcs_url(component)
-
-    licenses_info_text = "; ".join(licenses_info)
-    licenses_info_html_list = "<ul>" + "".join(licenses_info_html) + "</ul>"
+        license_items.append(('Exception', exception_data.get('name', 'Unknown'), exception_data.get('reference', 'No URL')))
+
+    return tuple(license_items)
+
+def format_license_text(license_items):
+    return "; ".join(f"{kind}: {label}, {url}" if url else f"{kind}: {label}" for kind, label, url in license_items)
+
+def make_resolved_license(entry_key, license_ids, license_names, license_references, exceptions, exceptions_lookup):
+    items = format_license_info(license_ids, license_names, license_references, exceptions, exceptions_lookup)
+    return ResolvedLicense(
+        entry_key,
+        tuple(intern_value(license_id) for license_id in license_ids),
+        tuple(license_names),
+        tuple(intern_value(reference) for reference in license_references),
+        tuple(intern_value(exception) for exception in exceptions),
+        items,
+        format_license_text(items),
+    )
+
+def resolve_license_entry(entry_key, licenses_lookup, exceptions_lookup):
+    resolved = LICENSE_RESOLUTIONS.get(entry_key)
+    if resolved is None:
+        resolved = make_resolved_license(entry_key, *process_license(LICENSE_ENTRIES[entry_key], licenses_lookup, exceptions_lookup), exceptions_lookup)
+        LICENSE_RESOLUTIONS[entry_key] = resolved
+    return resolved
+
+def resolution_fingerprint(licenses_lookup, exceptions_lookup):
+    # Stored resolutions are only valid for the SPDX data and name mapping they were made with
+    digest = hashlib.sha256()
+    for table in (licenses_lookup, exceptions_lookup, LICENSE_NAME_TO_ID_MAP):
+        digest.update(json.dumps(table, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def restore_license_resolutions(state, fingerprint, exceptions_lookup):
+    if state.get('fingerprint') != fingerprint:
+        return 0
+    resolutions = state.get('resolutions', {})
+    for entry_key, resolution in resolutions.items():
+        entry_key = sys.intern(entry_key)
+        LICENSE_RESOLUTIONS[entry_key] = make_resolved_license(entry_key, *resolution, exceptions_lookup)
+    return len(resolutions)
+
+def store_license_resolutions(state, fingerprint):
+    # Every current component has been interned this run, so LICENSE_ENTRIES bounds what is kept
+    state['fingerprint'] = fingerprint
+    state['resolutions'] = {
+        entry_key: [resolved.license_ids, resolved.license_names, resolved.license_references, resolved.exceptions]
+        for entry_key, resolved in LICENSE_RESOLUTIONS.items() if entry_key in LICENSE_ENTRIES
+    }
 
-    component_info = f"Component: {component['group']}:{component['name']}, Version: {component['version']}, {licenses_info_text}, VCS: {vcs_url}"
-    if vcs_url != "N/A":
-        component_info_html = f"{component['group']}:{component['name']}, {component['version']}, {licenses_info_html_list}, <a href='{vcs_url}' target='_blank'>{vcs_url}</a>"
-    else:
-        component_info_html = f"{component['group']}:{component['name']}, {component['version']}, {licenses_info_html_list}, N/A"
+def license_entry_name(license):
+    if 'license' in license and 'id' not in license['license']:
+        return license['license'].get('name')
+    if 'expression' not in license and 'license' not in license:
+        return license.get('name')
+    return None
+
+def unmatched_license_names(index):
+    """Return the license names of the current components that neither the mapping nor the license list matches."""
+    names = set()
+    for license in LICENSE_ENTRIES.values():
+        name = license_entry_name(license)
+        if name and name not in names and index.mapped_ids(name) is None and index.match_name(name) is None:
+            names.add(name)
+    return sorted(names)
+
+def suggest_license_names(index):
+    return {name: [{'id': license_id, 'score': round(score, 3)} for license_id, score in index.suggest(name)] for name in unmatched_license_names(index)}
+
+def component_license_summaries(rows):
+    return {
+        f"{row.group}:{row.name}:{row.version}": sorted({label for resolved in row.licenses for _, label, _ in resolved.items})
+        for row in rows
+    }
 
-    return component_info, component_info_html
+def diff_license_summaries(previous, current):
+    """Compare the license labels of two runs and return the added, removed and relicensed components."""
+    return {
+        'added': [{'component': key, 'licenses': current[key]} for key in sorted(current) if key not in previous],
+        'removed': [{'component': key, 'licenses': previous[key]} for key in sorted(previous) if key not in current],
+        'relicensed': [
+            {'component': key, 'before': previous[key], 'after': current[key]}
+            for key in sorted(current) if key in previous and previous[key] != current[key]
+        ],
+    }
 
-def generate_reports(components, licenses_lookup, exceptions_lookup):
-    license_report = []
-    license_report_html = []
-    license_texts = {}
+def load_policy_rules(policy_file):
+    """Load and validate a policy rules file; raises OSError or ValueError, since a broken policy must not pass silently."""
+    with open(policy_file, 'r') as file:
+        rules = json.load(file)
+    if not isinstance(rules, dict):
+        raise ValueError("the policy must be a JSON object")
+    for section in ('licenses', 'exceptions'):
+        lists = rules.get(section, {})
+        if not isinstance(lists, dict) or set(lists) - set(POLICY_STATUSES):
+            raise ValueError(f"'{section}' must map {', '.join(POLICY_STATUSES)} to lists of IDs")
+        for status, ids in lists.items():
+            if not isinstance(ids, list) or not all(isinstance(item, str) for item in ids):
+                raise ValueError(f"'{section}.{status}' must be a list of IDs")
+    for key in ('default', 'unknown'):
+        if rules.get(key, 'review') not in POLICY_STATUSES:
+            raise ValueError(f"'{key}' must be one of {', '.join(POLICY_STATUSES)}")
+    return rules
+
+class LicensePolicy:
+    """Allow, review and deny rules for license and exception IDs, evaluated with bitsets.
+
+    Every distinct license or exception seen gets one bit, and a choice of licenses is the mask of the bits
+    it requires, as strict as its strictest ID. An OR is as lenient as its best child and an AND as strict
+    as its strictest one, so an expression compiles into at most one choice per status and is evaluated
+    exactly. A component needs all of its entries. Entries and license sets are evaluated once each,
+    which leaves a single lookup per component.
+    """
+
+    def __init__(self, rules, index, exceptions_lookup):
+        self.index = index
+        self.exceptions_lookup = exceptions_lookup
+        self.statuses = {}
+        for kind, section in (('license', 'licenses'), ('exception', 'exceptions')):
+            for status, ids in rules.get(section, {}).items():
+                for rule_id in ids:
+                    self.statuses[self.term(kind, rule_id)] = POLICY_STATUSES.index(status)
+        self.default = POLICY_STATUSES.index(rules.get('default', 'review'))
+        self.unknown = POLICY_STATUSES.index(rules.get('unknown', 'review'))
+        self.bits = {}
+        self.labels = []
+        self.review_mask = 0
+        self.deny_mask = 0
+        # Kept across evaluate calls and keyed on entry keys, so batch projects sharing entries and license sets evaluate them once
+        self.entries = {}
+        self.sets = {}
+
+    def term(self, kind, term_id):
+        if kind == 'exception':
+            return kind, self.index.exception_key(term_id) or term_id.lower()
+        return kind, self.index.license_id(term_id) or term_id
+
+    def term_status(self, term):
+        status = self.statuses.get(term)
+        if status is not None:
+            return status
+        kind, key = term
+        known = key in self.exceptions_lookup if kind == 'exception' else key.lower() in self.index.license_ids
+        return self.default if known else self.unknown
+
+    def mask(self, terms):
+        mask = 0
+        for term in terms:
+            bit = self.bits.get(term)
+            if bit is None:
+                bit = self.bits[term] = 1 << len(self.labels)
+                self.labels.append(term[1])
+                status = self.term_status(term)
+                if status == 2:
+                    self.deny_mask |= bit
+                elif status == 1:
+                    self.review_mask |= bit
+            mask |= bit
+        return mask
+
+    def resolved_terms(self, license_ids, license_names, exceptions):
+        # The same split as format_license_info: exceptions once, licenses by ID or, if unknown, by name
+        exception_ids = {ex.lower() for ex in exceptions}
+        terms = [('license', license_id if license_id != 'Unknown' else license_name)
+                 for license_id, license_name in zip(license_ids, license_names) if license_id.lower() not in exception_ids]
+        return terms + [('exception', exception) for exception in exceptions]
+
+    def expression_choices(self, node, licenses_lookup, exceptions_lookup):
+        """Return {status: mask} with one choice of licenses for each status the expression can evaluate to."""
+        kind = node[0]
+        if kind == 'or':
+            choices = {}
+            for child in node[1]:
+                for status, mask in self.expression_choices(child, licenses_lookup, exceptions_lookup).items():
+                    choices.setdefault(status, mask)
+            return choices
+        if kind == 'and':
+            # Combining two choices gives the stricter status of the two, so one choice per status is enough
+            choices = {0: 0}
+            for child in node[1]:
+                child_choices = self.expression_choices(child, licenses_lookup, exceptions_lookup)
+                combined = {}
+                for status, mask in choices.items():
+                    for child_status, child_mask in child_choices.items():
+                        combined.setdefault(max(status, child_status), mask | child_mask)
+                choices = combined
+            return choices
+        # A license, LicenseRef or 'X WITH Y' leaf is resolved exactly like the report resolves it
+        if kind == 'with':
+            leaf = f"{node[1][1]}{'+' if node[1][2] else ''} WITH {node[2]}"
+        else:
+            leaf = node[1] + ('+' if kind == 'license' and node[2] else '')
+        license_ids, license_names, _, exceptions = resolve_license_expression(leaf, licenses_lookup, exceptions_lookup)
+        return self.mask_choices(self.mask(self.resolved_terms(license_ids, license_names, exceptions)))
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(process_component, key, component, licenses_lookup, license_texts, exceptions_lookup): key for key, component in components.items()}
-        for future in as_completed(futures):
+    def entry_choices(self, resolved, licenses_lookup, exceptions_lookup):
+        license = LICENSE_ENTRIES.get(resolved.entry_key, {})
+        if 'expression' in license:
             try:
-                component_info, component_info_html = future.result()
-                license_report.append(component_info)
-                license_report_html.append(component_info_html)
-            except Exception as e:
-                print(f"Error processing component: {e}")
-
-    return license_report, license_report_html, license_texts
-
-def write_text_report(filename, data):
-    with open(filename, "w") as file:
-        for item in data:
-            file.write(f"{item}\n")
-
-def write_html_report(filename, data):
-    html_report = """
+                return self.expression_choices(parse_license_expression(license['expression']), licenses_lookup, exceptions_lookup)
+            except ValueError:
+                pass
+        return self.mask_choices(self.mask(self.resolved_terms(resolved.license_ids, resolved.license_names, resolved.exceptions)))
+
+    def choice_status(self, mask):
+        return 2 if mask & self.deny_mask else 1 if mask & self.review_mask else 0
+
+    def mask_choices(self, mask):
+        return {self.choice_status(mask): mask}
+
+    def mask_labels(self, mask):
+        labels = []
+        while mask:
+            bit = mask & -mask
+            labels.append(self.labels[bit.bit_length() - 1])
+            mask ^= bit
+        return labels
+
+    def evaluate(self, rows, licenses_lookup, exceptions_lookup, fail_on='deny'):
+        """Evaluate every row and return the violations report."""
+        entries, sets = self.entries, self.sets
+        counts = [0, 0, 0]
+        violations = []
+        for row in rows:
+            set_key = tuple(resolved.entry_key for resolved in row.licenses)
+            result = sets.get(set_key)
+            if result is None:
+                status, mask = (0, 0) if row.licenses else (self.unknown, self.mask([('license', 'Unknown')]))
+                for resolved in row.licenses:
+                    entry = entries.get(resolved.entry_key)
+                    if entry is None:
+                        choices = self.entry_choices(resolved, licenses_lookup, exceptions_lookup)
+                        best = min(choices)
+                        entry = entries[resolved.entry_key] = (best, choices[best])
+                    status, mask = max(status, entry[0]), mask | entry[1]
+                # Components with the same license set share their violation details
+                result = sets[set_key] = (status, status and {
+                    'status': POLICY_STATUSES[status],
+                    'deny': self.mask_labels(mask & self.deny_mask),
+                    'review': self.mask_labels(mask & self.review_mask),
+                    'licenses': "; ".join(resolved.text for resolved in row.licenses),
+                })
+            status, details = result
+            counts[status] += 1
+            if status:
+                violations.append({'component': f"{row.group}:{row.name}", 'version': row.version, **details})
+        summary = dict(zip(POLICY_STATUSES, counts), components=len(rows), fail_on=fail_on)
+        summary['failed'] = policy_failed(summary)
+        return {'summary': summary, 'violations': violations}
+
+def policy_failed(summary):
+    if summary['fail_on'] == 'review':
+        return bool(summary['deny'] or summary['review'])
+    return bool(summary['deny'])
+
+def init_resolver_tables(licenses_lookup, exceptions_lookup, name_to_id_map):
+    global LICENSE_NAME_TO_ID_MAP
+    LICENSE_NAME_TO_ID_MAP = name_to_id_map
+    RESOLVER_TABLES.update(licenses=licenses_lookup, exceptions=exceptions_lookup)
+
+def resolve_license_entry_chunk(entry_keys):
+    licenses_lookup, exceptions_lookup = RESOLVER_TABLES['licenses'], RESOLVER_TABLES['exceptions']
+    resolutions = []
+    for entry_key in entry_keys:
+        # The canonical key is the entry's JSON, so workers need no copy of LICENSE_ENTRIES
+        try:
+            resolved = make_resolved_license(entry_key, *process_license(json.loads(entry_key), licenses_lookup, exceptions_lookup), exceptions_lookup)
+            # Plain tuples pickle much faster than __slots__ objects; the caller already has the entry key
+            resolutions.append(tuple(getattr(resolved, slot) for slot in ResolvedLicense.__slots__[1:]))
+        except Exception:
+            # Left unresolved, so that the serial path reports the error for the component
+            resolutions.append(None)
+    return resolutions
+
+def create_resolver_pool(workers, licenses_lookup, exceptions_lookup):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    # Without fork, every worker receives the tables once when it starts rather than with every task
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_resolver_tables, initargs=(licenses_lookup, exceptions_lookup, LICENSE_NAME_TO_ID_MAP))
+
+def resolve_license_entries(entry_keys, licenses_lookup, exceptions_lookup):
+    """Resolve distinct license entries in parallel with the configured executor.
+
+    Entries are split into chunks of RESOLVE_SETTINGS['chunk_size'] and the results are stored in
+    LICENSE_RESOLUTIONS in submission order, so the reports do not depend on which worker finished first.
+    """
+    pending = [entry_key for entry_key in entry_keys if entry_key not in LICENSE_RESOLUTIONS]
+    executor_name = RESOLVE_SETTINGS['executor']
+    if executor_name == 'serial' or not pending:
+        return
+    chunk_size = max(1, RESOLVE_SETTINGS['chunk_size'])
+    chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+    workers = min(RESOLVE_SETTINGS['workers'], len(chunks))
+
+    init_resolver_tables(licenses_lookup, exceptions_lookup, LICENSE_NAME_TO_ID_MAP)
+    # Compiled before the pool starts, so forked workers inherit it too
+    get_license_index(licenses_lookup, exceptions_lookup)
+    if executor_name == 'thread':
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = create_resolver_pool(workers, licenses_lookup, exceptions_lookup)
+    with executor:
+        for chunk, resolutions in zip(chunks, executor.map(resolve_license_entry_chunk, chunks)):
+            for entry_key, resolved in zip(chunk, resolutions):
+                if resolved is not None:
+                    LICENSE_RESOLUTIONS[entry_key] = ResolvedLicense(entry_key, *resolved)
+
+def process_component(key, component, licenses_lookup, exceptions_lookup):
+    licenses = tuple(resolve_license_entry(entry_key, licenses_lookup, exceptions_lookup) for entry_key in component.licenses)
+    return ComponentRow(component.group, component.name, component.version, licenses, component.vcs_url)
+
+def resolve_components(components, licenses_lookup, exceptions_lookup):
+    """Resolve components into report rows and collect the license texts the rows need."""
+    keyed_rows, targets = resolve_keyed_components(components, licenses_lookup, exceptions_lookup)
+    return [row for _, row in keyed_rows], targets
+
+def resolve_keyed_components(components, licenses_lookup, exceptions_lookup):
+    """Like resolve_components, but return (key, row) pairs."""
+    rows = []
+    targets = {}
+    seen_licenses = set()
+
+    # Accepts a dict or a stream of (key, component) pairs, so components are resolved while
+    # ingestion is still running; license texts are only needed by the writers and come last
+    components = components.items() if isinstance(components, dict) else components
+    if RESOLVE_SETTINGS['executor'] != 'serial':
+        # Parallel executors resolve every distinct license entry up front; the rows are then built from the memo
+        components = list(components)
+        resolve_license_entries(dict.fromkeys(entry_key for _, component in components for entry_key in component.licenses), licenses_lookup, exceptions_lookup)
+    for key, component in components:
+        try:
+            row = process_component(key, component, licenses_lookup, exceptions_lookup)
+            # Only components that resolved need license texts, and a malformed entry only skips its component
+            add_license_text_targets(targets, seen_licenses, component, licenses_lookup, exceptions_lookup)
+            rows.append((key, row))
+        except Exception as e:
+            METRICS.error('component', f"Error processing component: {e}")
+    return rows, targets
+
+# Report writers join this many lines per write call
+WRITE_CHUNK_LINES = 1000
+
+HTML_REPORT_HEADER = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -365,20 +1853,8 @@ def write_html_report(filename, data):
         </thead>
         <tbody>
 """
-    for item in data:
-        component, version, *licenses_info = item.split(', ')
-        vcs_info = licenses_info.pop().replace("VCS: ", "")
-        licenses_html = ", ".join(licenses_info).replace("License: ", "").replace("Unknown, ", "")
-        html_report += f"""
-            <tr>
-                <td>{component}</td>
-                <td>{version}</td>
-                <td>{licenses_html}</td>
-                <td>{vcs_info}</td>
-            </tr>
-        """
 
-    html_report += """
+HTML_REPORT_FOOTER = """
         </tbody>
     </table>
     <script>
@@ -407,65 +1883,1467 @@ def write_html_report(filename, data):
 </html>
 """
 
-    with open(filename, "w") as html_file:
-        html_file.write(html_report)
-
-def write_license_texts(text_filename, html_filename, license_texts):
-    with open(text_filename, "w") as txt_file:
-        for license_id, texts in license_texts.items():
-            txt_file.write(f"License ID: {license_id}\n")
-            txt_file.write(f"{texts['text']}\n\n")
-
-    html_content = """
+LICENSE_TEXTS_HTML_HEADER = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
+    <meta charset="utf-8">
     <title>License Texts</title>
+    <style>
+        summary {
+            cursor: pointer;
+            font-size: 1.5em;
+            font-weight: bold;
+            margin: 0.5em 0;
+        }
+    </style>
 </head>
 <body>
 """
-    for license_id, texts in license_texts.items():
-        html_content += f"<h2>License ID: {license_id}</h2>"
-        html_content += texts['html']
-        html_content += "<hr>"
-    html_content += """
+
+LICENSE_TEXTS_HTML_FOOTER = """
+    <script>
+        (function () {
+            function loadText(digest) {
+                var element = document.getElementById("text-" + digest);
+                if (element.getAttribute("data-encoding") !== "gzip+base64") {
+                    return Promise.resolve(JSON.parse(element.textContent));
+                }
+                var binary = atob(element.textContent.trim());
+                var bytes = new Uint8Array(binary.length);
+                for (var i = 0; i < binary.length; i++) {
+                    bytes[i] = binary.charCodeAt(i);
+                }
+                var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+                return new Response(stream).text();
+            }
+
+            // License bodies are only parsed and rendered when their section is opened
+            function expand(details) {
+                if (details.hasAttribute("data-loaded")) {
+                    return;
+                }
+                details.setAttribute("data-loaded", "");
+                loadText(details.getAttribute("data-text")).then(function (body) {
+                    var content = document.createElement("div");
+                    content.innerHTML = body;
+                    details.appendChild(content);
+                });
+            }
+
+            function openAnchor() {
+                var target = document.getElementById(decodeURIComponent(window.location.hash.slice(1)));
+                if (target && target.tagName === "DETAILS") {
+                    target.open = true;
+                    target.scrollIntoView();
+                }
+            }
+
+            document.addEventListener("toggle", function (event) {
+                if (event.target.open) {
+                    expand(event.target);
+                }
+            }, true);
+            window.addEventListener("hashchange", openAnchor);
+            openAnchor();
+        })();
+    </script>
 </body>
 </html>
 """
 
-    with open(html_filename, "w") as html_file:
-        html_file.write(html_content)
+VIRTUAL_HTML_REPORT_HEADER = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <title>License Compliance Report</title>
+    <style>
+        body {
+            font-family: sans-serif;
+        }
+        .controls {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 8px;
+            margin-bottom: 10px;
+        }
+        .controls input[type="text"] {
+            flex: 1;
+            min-width: 240px;
+            padding: 8px;
+        }
+        .controls select, .controls button {
+            padding: 8px;
+        }
+        #viewport {
+            position: relative;
+            height: 75vh;
+            overflow-y: auto;
+            border: 1px solid black;
+        }
+        #viewport table {
+            position: absolute;
+            top: 0;
+            left: 0;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            table-layout: fixed;
+        }
+        th, td {
+            height: 28px;
+            padding: 0 8px;
+            border: 1px solid black;
+            text-align: left;
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+        th {
+            background-color: #f2f2f2;
+            cursor: pointer;
+        }
+        #groups td {
+            cursor: pointer;
+        }
+        #status {
+            margin-bottom: 10px;
+        }
+    </style>
+</head>
+<body>
+    <h1>License Compliance Report</h1>
+    <div class="controls">
+        <input type="text" id="searchInput" placeholder="Search for components..">
+        <select id="licenseFilter"><option value="">All licenses</option></select>
+        <select id="exceptionFilter"><option value="">All exceptions</option></select>
+        <button type="button" id="groupToggle">Group by license</button>
+    </div>
+    <div id="status">Loading...</div>
+    <div id="viewport">
+        <div id="spacer"></div>
+        <table id="complianceTable">
+            <colgroup><col style="width: 30%"><col style="width: 10%"><col style="width: 35%"><col style="width: 25%"></colgroup>
+            <thead>
+                <tr>
+                    <th data-column="c">Component</th>
+                    <th data-column="v">Version</th>
+                    <th data-column="s">License</th>
+                    <th data-column="u">VCS</th>
+                </tr>
+            </thead>
+            <tbody id="rows"></tbody>
+        </table>
+    </div>
+    <div id="groups" hidden>
+        <table>
+            <thead>
+                <tr>
+                    <th>License</th>
+                    <th>Components</th>
+                </tr>
+            </thead>
+            <tbody id="groupRows"></tbody>
+        </table>
+    </div>
+"""
 
-def main():
-    parser = argparse.ArgumentParser(description='Generate license compliance reports from SBOM JSON files.')
-    parser.add_argument('--sbom-dir', type=str, default='sboms', help='Directory containing SBOM JSON files (default: sboms)')
-    parser.add_argument('--mapping-file', type=str, help='Optional JSON file to map complex license names to SPDX IDs')
-    args = parser.parse_args()
+VIRTUAL_HTML_REPORT_FOOTER = """
+    <script>
+        (function () {
+            var MAX_SCROLL_HEIGHT = 8000000;
+            var data, count, rowHeight = 29, headerHeight = 30;
+            var nameIndex, versionIndex, urlIndex, setIndex, rowsByVersion, rowsByUrl, rowsBySet;
+            var setLabels = [], setHtml = [], sortOrders = {};
+            var view = [], sortColumn = null, sortDescending = false;
+            var viewport = document.getElementById("viewport");
+            var spacer = document.getElementById("spacer");
+            var table = document.getElementById("complianceTable");
+            var tbody = document.getElementById("rows");
+            var statusLine = document.getElementById("status");
+            var searchInput = document.getElementById("searchInput");
+            var licenseFilter = document.getElementById("licenseFilter");
+            var exceptionFilter = document.getElementById("exceptionFilter");
+            var groupToggle = document.getElementById("groupToggle");
+            var groups = document.getElementById("groups");
+
+            function escapeHtml(value) {
+                return String(value).replace(/[&<>"']/g, function (c) {
+                    return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+                });
+            }
 
-    sbom_dir = args.sbom_dir
-    mapping_file = args.mapping_file
+            function linkHtml(url) {
+                if (/^https?:\\/\\//.test(url)) {
+                    return '<a href="' + escapeHtml(url) + '" target="_blank">' + escapeHtml(url) + '</a>';
+                }
+                return escapeHtml(url);
+            }
 
-    global LICENSE_NAME_TO_ID_MAP
-    LICENSE_NAME_TO_ID_MAP = load_license_name_to_id_map(mapping_file)
+            function tokenize(text) {
+                return String(text).toLowerCase().split(/[^a-z0-9]+/).filter(Boolean);
+            }
 
-    licenses_data = fetch_data(LICENSES_URL).get('licenses', [])
-    licenses_lookup = {license['licenseId']: license for license in licenses_data}
+            function loadData() {
+                var element = document.getElementById("reportData");
+                if (element.getAttribute("data-encoding") !== "gzip+base64") {
+                    return Promise.resolve(JSON.parse(element.textContent));
+                }
+                var binary = atob(element.textContent.trim());
+                var bytes = new Uint8Array(binary.length);
+                for (var i = 0; i < binary.length; i++) {
+                    bytes[i] = binary.charCodeAt(i);
+                }
+                var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+                return new Response(stream).text().then(JSON.parse);
+            }
 
-    exceptions_data = fetch_data(EXCEPTIONS_URL).get('exceptions', [])
-    exceptions_lookup = {
-        exception['licenseExceptionId'].lower(): {
-            'name': exception.get('name', ''),
-            'reference': resolve_relative_url('https://spdx.org/licenses/', exception.get('detailsUrl', '')),
-            'detailsUrl': resolve_relative_url('https://spdx.org/licenses/', exception.get('reference', ''))
-        } for exception in exceptions_data
+            function addToken(index, token, id) {
+                var ids = index.get(token);
+                if (!ids) {
+                    index.set(token, ids = []);
+                }
+                if (ids[ids.length - 1] !== id) {
+                    ids.push(id);
+                }
+            }
+
+            function buildTableIndex(values) {
+                var index = new Map();
+                values.forEach(function (value, id) {
+                    tokenize(value).forEach(function (token) {
+                        addToken(index, token, id);
+                    });
+                });
+                return sortedIndex(index);
+            }
+
+            function sortedIndex(ids) {
+                // Sorted tokens, so a prefix search binary-searches its range instead of scanning every token
+                return {ids: ids, tokens: Array.from(ids.keys()).sort()};
+            }
+
+            function forEachPrefixMatch(index, term, callback) {
+                var tokens = index.tokens, low = 0, high = tokens.length;
+                while (low < high) {
+                    var middle = (low + high) >>> 1;
+                    if (tokens[middle] < term) {
+                        low = middle + 1;
+                    } else {
+                        high = middle;
+                    }
+                }
+                for (var i = low; i < tokens.length && tokens[i].startsWith(term); i++) {
+                    callback(index.ids.get(tokens[i]));
+                }
+            }
+
+            function groupRows(column, size) {
+                var rows = [];
+                for (var i = 0; i < size; i++) {
+                    rows.push([]);
+                }
+                for (var row = 0; row < count; row++) {
+                    rows[column[row]].push(row);
+                }
+                return rows;
+            }
+
+            function buildIndexes() {
+                count = data.c.length;
+                var names = new Map();
+                for (var row = 0; row < count; row++) {
+                    tokenize(data.c[row]).forEach(function (token) {
+                        addToken(names, token, row);
+                    });
+                }
+                nameIndex = sortedIndex(names);
+                data.sets.forEach(function (items, id) {
+                    setLabels[id] = items.map(function (item) {
+                        var entry = data.items[item];
+                        return (entry[0] === "E" ? "Exception: " : "") + entry[1];
+                    }).join("; ");
+                });
+                versionIndex = buildTableIndex(data.versions);
+                urlIndex = buildTableIndex(data.urls);
+                setIndex = buildTableIndex(data.sets.map(function (items) {
+                    return items.map(function (item) { return data.items[item].slice(0, 3).join(" "); }).join(" ");
+                }));
+                rowsByVersion = groupRows(data.v, data.versions.length);
+                rowsByUrl = groupRows(data.u, data.urls.length);
+                rowsBySet = groupRows(data.s, data.sets.length);
+
+                var licenses = new Set(), exceptions = new Set();
+                data.items.forEach(function (item) {
+                    (item[0] === "E" ? exceptions : licenses).add(item[1]);
+                });
+                fillSelect(licenseFilter, licenses);
+                fillSelect(exceptionFilter, exceptions);
+            }
+
+            function fillSelect(select, values) {
+                Array.from(values).sort().forEach(function (value) {
+                    var option = document.createElement("option");
+                    option.value = option.textContent = value;
+                    select.appendChild(option);
+                });
+            }
+
+            function renderSet(id) {
+                if (setHtml[id] === undefined) {
+                    setHtml[id] = data.sets[id].map(function (item) {
+                        var entry = data.items[item];
+                        var label = entry[3] ? '<a href="' + escapeHtml(entry[3]) + '">' + escapeHtml(entry[1]) + '</a>' : escapeHtml(entry[1]);
+                        label = (entry[0] === "E" ? "Exception: " : "") + label;
+                        return entry[2] ? label + ", " + linkHtml(entry[2]) : label;
+                    }).join("; ");
+                }
+                return setHtml[id];
+            }
+
+            function sortOrder(column) {
+                if (!sortOrders[column]) {
+                    var keys;
+                    if (column === "c") {
+                        keys = data.c;
+                    } else {
+                        var values = column === "v" ? data.versions : column === "u" ? data.urls : setLabels;
+                        keys = Array.from(data[column], function (id) { return values[id]; });
+                    }
+                    var order = new Uint32Array(count);
+                    for (var i = 0; i < count; i++) {
+                        order[i] = i;
+                    }
+                    order.sort(function (a, b) {
+                        return keys[a] < keys[b] ? -1 : keys[a] > keys[b] ? 1 : a - b;
+                    });
+                    sortOrders[column] = order;
+                }
+                return sortOrders[column];
+            }
+
+            function markTableMatches(term, index, rowsById, mark) {
+                forEachPrefixMatch(index, term, function (ids) {
+                    ids.forEach(function (id) {
+                        mark(rowsById[id]);
+                    });
+                });
+            }
+
+            function searchMatches(query) {
+                var terms = tokenize(query);
+                if (!terms.length) {
+                    return null;
+                }
+                // hits[row] counts the terms a row matched; it only advances if the row matched every earlier term
+                var hits = new Uint16Array(count);
+                terms.forEach(function (term, matched) {
+                    function mark(rows) {
+                        for (var i = 0; i < rows.length; i++) {
+                            if (hits[rows[i]] === matched) {
+                                hits[rows[i]] = matched + 1;
+                            }
+                        }
+                    }
+                    forEachPrefixMatch(nameIndex, term, mark);
+                    markTableMatches(term, versionIndex, rowsByVersion, mark);
+                    markTableMatches(term, urlIndex, rowsByUrl, mark);
+                    markTableMatches(term, setIndex, rowsBySet, mark);
+                });
+                return {hits: hits, terms: terms.length};
+            }
+
+            function allowedSets() {
+                var license = licenseFilter.value, exception = exceptionFilter.value;
+                if (!license && !exception) {
+                    return null;
+                }
+                return data.sets.map(function (items) {
+                    var hasLicense = !license, hasException = !exception;
+                    items.forEach(function (item) {
+                        var entry = data.items[item];
+                        if (entry[0] === "L" && entry[1] === license) {
+                            hasLicense = true;
+                        } else if (entry[0] === "E" && entry[1] === exception) {
+                            hasException = true;
+                        }
+                    });
+                    return hasLicense && hasException;
+                });
+            }
+
+            function update() {
+                var matches = searchMatches(searchInput.value);
+                var sets = allowedSets();
+                var order = sortColumn ? sortOrder(sortColumn) : null;
+                view = [];
+                for (var i = 0; i < count; i++) {
+                    var position = sortDescending ? count - 1 - i : i;
+                    var row = order ? order[position] : position;
+                    if ((!matches || matches.hits[row] === matches.terms) && (!sets || sets[data.s[row]])) {
+                        view.push(row);
+                    }
+                }
+                viewport.scrollTop = 0;
+                if (groups.hidden) {
+                    render();
+                } else {
+                    renderGroups();
+                }
+            }
+
+            function render() {
+                var total = view.length;
+                var visible = Math.max(1, Math.ceil((viewport.clientHeight - headerHeight) / rowHeight));
+                var fullHeight = total * rowHeight + headerHeight;
+                var scrollHeight = Math.min(fullHeight, MAX_SCROLL_HEIGHT);
+                spacer.style.height = scrollHeight + "px";
+
+                var first;
+                if (fullHeight <= MAX_SCROLL_HEIGHT) {
+                    first = Math.floor(viewport.scrollTop / rowHeight);
+                } else {
+                    // Scale the scroll position when the list is taller than browsers can scroll
+                    var maxTop = Math.max(1, scrollHeight - viewport.clientHeight);
+                    first = Math.floor(viewport.scrollTop / maxTop * Math.max(0, total - visible));
+                }
+                first = Math.max(0, Math.min(first, total - visible));
+                var last = Math.min(total, first + visible);
+
+                var html = [];
+                for (var i = first; i < last; i++) {
+                    var row = view[i];
+                    html.push("<tr><td title=\\"" + escapeHtml(data.c[row]) + "\\">" + escapeHtml(data.c[row]) +
+                        "</td><td>" + escapeHtml(data.versions[data.v[row]]) +
+                        "</td><td title=\\"" + escapeHtml(setLabels[data.s[row]]) + "\\">" + renderSet(data.s[row]) +
+                        "</td><td>" + linkHtml(data.urls[data.u[row]]) + "</td></tr>");
+                }
+                tbody.innerHTML = html.join("");
+                table.style.top = viewport.scrollTop + "px";
+                statusLine.textContent = total ?
+                    "Showing " + (first + 1) + "-" + last + " of " + total + " components" + (total < count ? " (filtered from " + count + ")" : "") :
+                    "No matching components (" + count + " in total)";
+            }
+
+            function renderGroups() {
+                var rowsPerSet = new Uint32Array(data.sets.length);
+                view.forEach(function (row) { rowsPerSet[data.s[row]]++; });
+                var totals = new Map();
+                data.sets.forEach(function (items, id) {
+                    if (!rowsPerSet[id]) {
+                        return;
+                    }
+                    new Set(items.map(function (item) {
+                        var entry = data.items[item];
+                        return (entry[0] === "E" ? "Exception: " : "") + entry[1];
+                    })).forEach(function (label) {
+                        totals.set(label, (totals.get(label) || 0) + rowsPerSet[id]);
+                    });
+                });
+                var html = [];
+                Array.from(totals).sort(function (a, b) { return b[1] - a[1]; }).forEach(function (entry) {
+                    html.push("<tr data-label=\\"" + escapeHtml(entry[0]) + "\\"><td>" + escapeHtml(entry[0]) + "</td><td>" + entry[1] + "</td></tr>");
+                });
+                document.getElementById("groupRows").innerHTML = html.join("");
+                statusLine.textContent = totals.size + " licenses and exceptions across " + view.length + " components";
+            }
+
+            function showGroups(show) {
+                groups.hidden = !show;
+                viewport.hidden = show;
+                groupToggle.textContent = show ? "Show components" : "Group by license";
+                if (show) {
+                    renderGroups();
+                } else {
+                    render();
+                }
+            }
+
+            var searchTimer = null;
+            searchInput.addEventListener("input", function () {
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(update, 150);
+            });
+            licenseFilter.addEventListener("change", update);
+            exceptionFilter.addEventListener("change", update);
+            groupToggle.addEventListener("click", function () { showGroups(groups.hidden); });
+            viewport.addEventListener("scroll", function () { window.requestAnimationFrame(render); });
+            window.addEventListener("resize", render);
+            table.querySelector("thead").addEventListener("click", function (event) {
+                var column = event.target.getAttribute("data-column");
+                if (!column) {
+                    return;
+                }
+                sortDescending = sortColumn === column ? !sortDescending : false;
+                sortColumn = column;
+                update();
+            });
+            document.getElementById("groupRows").addEventListener("click", function (event) {
+                var label = event.target.closest("tr").getAttribute("data-label");
+                if (label.indexOf("Exception: ") === 0) {
+                    exceptionFilter.value = label.slice("Exception: ".length);
+                } else {
+                    licenseFilter.value = label;
+                }
+                showGroups(false);
+                update();
+            });
+
+            loadData().then(function (loaded) {
+                data = loaded;
+                buildIndexes();
+                render();
+                var sample = tbody.rows[0];
+                if (sample) {
+                    rowHeight = sample.getBoundingClientRect().height;
+                    headerHeight = table.tHead.getBoundingClientRect().height;
+                }
+                update();
+            });
+        })();
+    </script>
+</body>
+</html>
+"""
+
+def write_chunked(file, lines):
+    # Join a bounded number of lines per write instead of growing one large string
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= WRITE_CHUNK_LINES:
+            file.write("".join(chunk))
+            chunk = []
+    if chunk:
+        file.write("".join(chunk))
+
+def format_component_text(row):
+    licenses_info_text = "; ".join(resolved.text for resolved in row.licenses)
+    return f"Component: {row.group}:{row.name}, Version: {row.version}, {licenses_info_text}, VCS: {row.vcs_url}"
+
+def format_link_html(url):
+    if url.startswith(("http://", "https://")):
+        return f'<a href="{html.escape(url)}" target="_blank">{html.escape(url)}</a>'
+    return html.escape(url)
+
+def license_item_keys(resolved):
+    """Return the license text keys of a resolved entry's report items, in the order of format_license_info."""
+    exception_ids = {ex.lower() for ex in resolved.exceptions}
+    keys = [license_id for license_id, _, _ in zip(resolved.license_ids, resolved.license_names, resolved.license_references)
+            if license_id.lower() not in exception_ids]
+    return keys + list(resolved.exceptions)
+
+def license_text_anchor(key):
+    return f"license-{key}"
+
+def license_text_links(license_texts, html_filename):
+    """Map the keys of the fetched license texts to their anchors in the license texts HTML file."""
+    return {key: f"{html_filename}#{quote(license_text_anchor(key))}" for key in license_texts}
+
+def format_component_html(row, text_links=None):
+    license_items_html = []
+    for resolved in row.licenses:
+        keys = license_item_keys(resolved) if text_links else itertools.repeat(None)
+        for (kind, label, url), key in zip(resolved.items, keys):
+            label_html = html.escape(label)
+            if text_links and key in text_links:
+                label_html = f'<a href="{html.escape(text_links[key])}">{label_html}</a>'
+            if kind != 'License':
+                label_html = f"{kind}: {label_html}"
+            license_items_html.append(f"<li>{label_html}, {format_link_html(url)}</li>" if url else f"<li>{label_html}</li>")
+
+    return f"""
+            <tr>
+                <td>{html.escape(f"{row.group}:{row.name}")}</td>
+                <td>{html.escape(str(row.version))}</td>
+                <td><ul>{"".join(license_items_html)}</ul></td>
+                <td>{format_link_html(row.vcs_url)}</td>
+            </tr>
+        """
+
+# The render_* functions write to any text file object, e.g. an HTTP response in --serve mode
+
+def render_text_report(file, rows):
+    write_chunked(file, (f"{format_component_text(row)}\n" for row in rows))
+
+def render_html_report(html_file, rows, text_links=None):
+    html_file.write(HTML_REPORT_HEADER)
+    write_chunked(html_file, (format_component_html(row, text_links) for row in rows))
+    html_file.write(HTML_REPORT_FOOTER)
+
+def write_text_report(filename, rows):
+    with open(filename, "w") as file:
+        render_text_report(file, rows)
+
+def write_html_report(filename, rows, text_links=None):
+    with open(filename, "w") as html_file:
+        render_html_report(html_file, rows, text_links)
+
+def build_report_dataset(rows, text_links=None):
+    """Build the compact, columnar dataset embedded in the virtual HTML report.
+
+    Versions, VCS URLs, license items and per-component license sets are stored once in lookup
+    tables; the per-row columns only hold the component name and indexes into those tables.
+    License items are [kind, label, url, license text link].
+    """
+    versions, urls, items, sets = {}, {}, {}, {}
+    set_ids = {}
+    columns = {'c': [], 'v': [], 's': [], 'u': []}
+
+    for row in rows:
+        set_key = tuple(id(resolved) for resolved in row.licenses)
+        set_id = set_ids.get(set_key)
+        if set_id is None:
+            item_ids = tuple(items.setdefault(('E' if kind == 'Exception' else 'L', label, url, text_links.get(key, '') if text_links else ''), len(items))
+                             for resolved in row.licenses
+                             for (kind, label, url), key in zip(resolved.items, license_item_keys(resolved) if text_links else itertools.repeat(None)))
+            set_id = set_ids[set_key] = sets.setdefault(item_ids, len(sets))
+        columns['c'].append(f"{row.group}:{row.name}")
+        columns['v'].append(versions.setdefault(str(row.version), len(versions)))
+        columns['s'].append(set_id)
+        columns['u'].append(urls.setdefault(row.vcs_url, len(urls)))
+
+    return dict(columns, versions=list(versions), urls=list(urls), items=[list(item) for item in items], sets=[list(item_ids) for item_ids in sets])
+
+def render_virtual_html_report(html_file, rows, compress=False, text_links=None):
+    dataset = json.dumps(build_report_dataset(rows, text_links), separators=(',', ':'))
+    html_file.write(VIRTUAL_HTML_REPORT_HEADER)
+    if compress:
+        html_file.write('    <script type="application/octet-stream" id="reportData" data-encoding="gzip+base64">')
+        html_file.write(base64.b64encode(gzip.compress(dataset.encode('utf-8'))).decode('ascii'))
+    else:
+        html_file.write('    <script type="application/json" id="reportData">')
+        # Keep the embedded JSON from closing the script element early
+        html_file.write(dataset.replace("</", "<\\/"))
+    html_file.write('</script>')
+    html_file.write(VIRTUAL_HTML_REPORT_FOOTER)
+
+def write_virtual_html_report(filename, rows, compress=False, text_links=None):
+    with open(filename, "w") as html_file:
+        render_virtual_html_report(html_file, rows, compress, text_links)
+
+def license_text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def group_license_texts(license_texts, field):
+    """Return {sha256: (text, keys)} of the distinct 'text' or 'html' bodies, in first-seen order.
+
+    Aliases and IDs that differ only in case share a details document, so their texts are stored once.
+    """
+    groups = {}
+    for key, texts in license_texts.items():
+        text = texts[field]
+        digest = license_text_digest(text)
+        if digest not in groups:
+            groups[digest] = (text, [])
+        groups[digest][1].append(key)
+    return groups
+
+def render_license_texts_text(txt_file, license_texts):
+    write_chunked(txt_file, (f"License ID: {', '.join(keys)}\n{text}\n\n" for text, keys in group_license_texts(license_texts, 'text').values()))
+
+def format_license_text_body(digest, text, compress=False):
+    if compress:
+        body = base64.b64encode(gzip.compress(text.encode('utf-8'), mtime=0)).decode('ascii')
+        return f'<script type="application/octet-stream" id="text-{digest}" data-encoding="gzip+base64">{body}</script>\n'
+    # A JSON string can escape "</", so the body cannot close the script element early
+    body = json.dumps(text).replace("</", "<\\/")
+    return f'<script type="application/json" id="text-{digest}">{body}</script>\n'
+
+def render_license_texts_html(html_file, license_texts, compress=False):
+    """Write the license texts HTML: one collapsed section per ID, each distinct body embedded once.
+
+    Bodies are inert script elements that are only parsed when their section is opened, either by a
+    click or by a link to the section's anchor from the compliance report.
+    """
+    groups = group_license_texts(license_texts, 'html')
+    digests = {key: digest for digest, (_, keys) in groups.items() for key in keys}
+    html_file.write(LICENSE_TEXTS_HTML_HEADER)
+    write_chunked(html_file, (
+        f'<details id="{html.escape(license_text_anchor(key))}" data-text="{digests[key]}"><summary>License ID: {html.escape(key)}</summary></details>\n'
+        for key in license_texts))
+    write_chunked(html_file, (format_license_text_body(digest, text, compress) for digest, (text, _) in groups.items()))
+    html_file.write(LICENSE_TEXTS_HTML_FOOTER)
+
+def write_license_texts(text_filename, html_filename, license_texts, compress=False):
+    with open(text_filename, "w") as txt_file:
+        render_license_texts_text(txt_file, license_texts)
+
+    with open(html_filename, "w") as html_file:
+        render_license_texts_html(html_file, license_texts, compress)
+
+def compress_license_text(data, compression):
+    if compression == 'gzip':
+        # A fixed mtime keeps the compressed bytes, like the file name, a function of the text alone
+        return gzip.compress(data, mtime=0)
+    if compression == 'brotli':
+        return brotli.compress(data)
+    return data
+
+def write_license_text_store(directory, license_texts, compression=None):
+    """Write the license texts to a content-addressed store and return the number of new files.
+
+    Each distinct text is stored once as <sha256>.txt and <sha256>.html (plus .gz or .br when compressed),
+    and index.json maps every license and exception ID to the hashes of its texts. Files that already
+    exist hold the same text, so repeated runs only write texts they have not stored before.
+    """
+    os.makedirs(directory, exist_ok=True)
+    suffix = LICENSE_TEXTS_COMPRESSIONS.get(compression, '')
+    index = {key: {} for key in license_texts}
+    written = 0
+    for field, extension in (('text', 'txt'), ('html', 'html')):
+        for digest, (text, keys) in group_license_texts(license_texts, field).items():
+            path = os.path.join(directory, f"{digest}.{extension}{suffix}")
+            if not os.path.exists(path):
+                write_file_atomic(path, compress_license_text(text.encode('utf-8'), compression))
+                written += 1
+            for key in keys:
+                index[key][field] = f"{digest}.{extension}{suffix}"
+    with open(os.path.join(directory, LICENSE_TEXTS_INDEX_FILE), "w") as index_file:
+        json.dump({'compression': compression, 'licenses': index}, index_file, indent=2)
+    return written
+
+def write_license_diff(filename, diff):
+    with open(filename, "w") as diff_file:
+        json.dump(diff, diff_file, indent=2)
+
+def write_violations(filename, report):
+    with open(filename, "w") as violations_file:
+        json.dump(report, violations_file, indent=2)
+
+def write_reports(output_dir, rows, license_texts, html_report='table', html_compress=False):
+    """Write the compliance reports and the license texts of one run or batch project to output_dir."""
+    text_links = license_text_links(license_texts, "licenses_text.html")
+    write_text_report(os.path.join(output_dir, "license_compliance.txt"), rows)
+    if html_report == 'virtual':
+        write_virtual_html_report(os.path.join(output_dir, "license_compliance.html"), rows, compress=html_compress, text_links=text_links)
+    else:
+        write_html_report(os.path.join(output_dir, "license_compliance.html"), rows, text_links)
+    write_license_texts(os.path.join(output_dir, "licenses_text.txt"), os.path.join(output_dir, "licenses_text.html"), license_texts, compress=html_compress)
+
+def iter_document_components(documents):
+    """Yield (key, ComponentRecord) pairs of parsed SBOM documents, with the same precedence as iter_sbom_components."""
+    seen = set()
+    for document in documents:
+        for component in iter_components(document.get("components", [])):
+            key = component_key(component)
+            if key not in seen:
+                seen.add(key)
+                yield key, make_component_record(component)
+
+def format_component_json(row):
+    return json.dumps({
+        'component': f"{row.group}:{row.name}",
+        'version': row.version,
+        'licenses': [{'kind': kind, 'label': label, 'url': url} for resolved in row.licenses for kind, label, url in resolved.items],
+        'vcs': row.vcs_url,
+    })
+
+def render_json_report(file, rows):
+    file.write('[')
+    write_chunked(file, (("," if index else "") + format_component_json(row) for index, row in enumerate(rows)))
+    file.write(']')
+
+def render_served_report(file, report_format, rows, license_texts):
+    if report_format == 'text':
+        render_text_report(file, rows)
+    elif report_format == 'html':
+        render_html_report(file, rows)
+    elif report_format == 'virtual':
+        render_virtual_html_report(file, rows)
+    elif report_format == 'json':
+        render_json_report(file, rows)
+    elif report_format == 'license-texts':
+        render_license_texts_text(file, license_texts)
+    else:
+        render_license_texts_html(file, license_texts)
+
+class ChunkedResponse:
+    """Text file object that sends everything written to it as HTTP/1.1 chunks."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def close(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+class ReportService:
+    """SPDX tables, mapping, license index and license texts kept warm across --serve requests.
+
+    Requests share the tables; a reload waits for running requests and blocks new ones until it is done,
+    so a request never sees the tables or the resolution caches of two different mappings.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.reloading = False
+        self.license_texts = {}
+        # Texts being downloaded by a request, so concurrent requests wait for them instead of fetching them again
+        self.text_lock = threading.Lock()
+        self.text_fetches = {}
+        self.started = time.time()
+        configure_run(args)
+        self.load_tables()
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self.condition:
+            while self.reloading:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self.condition:
+            while self.reloading:
+                self.condition.wait()
+            self.reloading = True
+            while self.readers:
+                self.condition.wait()
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.reloading = False
+                self.condition.notify_all()
+
+    def mapping_mtime(self):
+        try:
+            return os.stat(self.args.mapping_file).st_mtime_ns if self.args.mapping_file else None
+        except OSError:
+            return None
+
+    def load_mapping(self):
+        global LICENSE_NAME_TO_ID_MAP
+        self.loaded_mapping_mtime = self.mapping_mtime()
+        LICENSE_NAME_TO_ID_MAP = load_license_name_to_id_map(self.args.mapping_file)
+        # Resolutions depend on the mapping; the entries are dropped with them
+        clear_resolution_cache()
+        LICENSE_ENTRIES.clear()
+
+    def trim_license_tables(self):
+        # Every upload interns its license entries, including any embedded license text, so the tables
+        # would otherwise grow for as long as the server runs; they refill from the next requests
+        if len(LICENSE_ENTRIES) <= SERVE_MAX_LICENSE_ENTRIES:
+            return
+        with self.exclusive():
+            if len(LICENSE_ENTRIES) > SERVE_MAX_LICENSE_ENTRIES:
+                # The license index and the bounded expression cache stay warm
+                with EXPRESSION_CACHE_LOCK:
+                    LICENSE_RESOLUTIONS.clear()
+                LICENSE_ENTRIES.clear()
+                METRICS.count('serve.license_table_resets')
+
+    def load_tables(self):
+        # The lists are fetched before the mapping and caches are swapped, so a failed reload changes nothing
+        licenses_lookup, exceptions_lookup = load_spdx_lists(self.args)
+        self.load_mapping()
+        with METRICS.stage('license_index'):
+            load_license_index(licenses_lookup, exceptions_lookup)
+        self.licenses_lookup, self.exceptions_lookup = licenses_lookup, exceptions_lookup
+
+    def reload(self, refresh=False):
+        with self.exclusive():
+            refresh_setting = CACHE_SETTINGS['refresh']
+            CACHE_SETTINGS['refresh'] = refresh
+            try:
+                self.load_tables()
+            finally:
+                CACHE_SETTINGS['refresh'] = refresh_setting
+            if refresh:
+                self.license_texts.clear()
+
+    def reload_mapping_if_changed(self):
+        if self.mapping_mtime() == self.loaded_mapping_mtime:
+            return
+        with self.exclusive():
+            # Another request may have reloaded it while this one waited
+            if self.mapping_mtime() != self.loaded_mapping_mtime:
+                self.load_mapping()
+                load_license_index(self.licenses_lookup, self.exceptions_lookup)
+                print(f"Reloaded mapping file {self.args.mapping_file}")
+
+    def fetch_license_texts(self, targets):
+        done = threading.Event()
+        with self.text_lock:
+            pending = {self.text_fetches[key] for key in targets if key in self.text_fetches}
+            missing = {key: target for key, target in targets.items() if key not in self.license_texts and key not in self.text_fetches}
+            for key in missing:
+                self.text_fetches[key] = done
+        try:
+            if missing:
+                fetched = prefetch_license_texts(missing)
+                with self.text_lock:
+                    self.license_texts.update(fetched)
+        finally:
+            with self.text_lock:
+                for key in missing:
+                    del self.text_fetches[key]
+            done.set()
+        for fetch in pending:
+            fetch.wait()
+        with self.text_lock:
+            return {key: self.license_texts[key] for key in targets if key in self.license_texts}
+
+    def report(self, documents):
+        self.reload_mapping_if_changed()
+        with self.shared():
+            rows, targets = resolve_components(iter_document_components(documents), self.licenses_lookup, self.exceptions_lookup)
+            license_texts = self.fetch_license_texts(targets)
+        self.trim_license_tables()
+        return rows, license_texts
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started),
+            'licenses': len(self.licenses_lookup),
+            'exceptions': len(self.exceptions_lookup),
+            'mapping_file': self.args.mapping_file,
+            'mapping_names': len(LICENSE_NAME_TO_ID_MAP),
+            'license_entries': len(LICENSE_ENTRIES),
+            'license_texts': len(self.license_texts),
+        }
+
+def make_report_handler(service):
+    class ReportHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Responses go out in several writes; without TCP_NODELAY each kept-alive response stalls on a delayed ACK
+        disable_nagle_algorithm = True
+
+        def send_json(self, status, data):
+            body = json.dumps(data, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_documents(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > SERVE_MAX_BODY:
+                raise ValueError(f"Expected an SBOM body of 1 to {SERVE_MAX_BODY} bytes")
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Encoding") == "gzip" or body[:2] == b"\x1f\x8b":
+                body = gzip.decompress(body)
+            # One SBOM document, or a list of them that are merged in order
+            documents = json.loads(body)
+            return documents if isinstance(documents, list) else [documents]
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path == "/health":
+                self.send_json(200, service.health())
+            elif path == "/metrics":
+                self.send_json(200, METRICS.to_dict())
+            else:
+                self.send_json(404, {'error': f"Unknown path {path}"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            query = dict(part.partition("=")[::2] for part in url.query.split("&") if part)
+            if url.path == "/reload":
+                with METRICS.timed('serve_reload'):
+                    try:
+                        service.reload(refresh=query.get("refresh") in ("1", "true"))
+                    except SPDXDataError as e:
+                        # The tables loaded before stay in use
+                        self.send_json(503, {'error': str(e)})
+                        return
+                self.send_json(200, dict(service.health(), status='reloaded'))
+                return
+            if url.path != "/report":
+                self.send_json(404, {'error': f"Unknown path {url.path}"})
+                return
+
+            report_format = query.get("format", "text")
+            if report_format not in SERVE_FORMATS:
+                self.send_json(400, {'error': f"Unknown format {report_format}, expected one of {', '.join(SERVE_FORMATS)}"})
+                return
+            METRICS.count('serve.requests')
+            with METRICS.timed('serve_report'):
+                try:
+                    rows, license_texts = service.report(self.read_documents())
+                except (ValueError, KeyError, TypeError, AttributeError, OSError, EOFError) as e:
+                    METRICS.count('serve.bad_requests')
+                    self.send_json(400, {'error': f"Invalid SBOM: {e}"})
+                    return
+
+                content_type = "application/json" if report_format == 'json' else "text/html" if "html" in report_format or report_format == 'virtual' else "text/plain"
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.send_header("X-Components", str(len(rows)))
+                self.end_headers()
+                response = ChunkedResponse(self.wfile)
+                render_served_report(response, report_format, rows, license_texts)
+                response.close()
+
+        def address_string(self):
+            # Unix socket peers have no address
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReportHandler
+
+class ReportHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class ReportUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def serve(args):
+    """Serve reports for uploaded SBOMs until interrupted, keeping the SPDX data warm between requests."""
+    service = ReportService(args)
+    handler = make_report_handler(service)
+    if args.unix_socket:
+        # Only a socket left behind by an earlier server is replaced, never another file
+        if os.path.exists(args.unix_socket) and stat.S_ISSOCK(os.stat(args.unix_socket).st_mode):
+            os.remove(args.unix_socket)
+        server = ReportUnixHTTPServer(args.unix_socket, handler)
+        address = f"unix:{args.unix_socket}"
+    else:
+        server = ReportHTTPServer((args.host, args.port), handler)
+        address = f"http://{args.host}:{server.server_address[1]}/"
+    print(f"Serving license reports at {address} (POST /report, POST /reload, GET /health, GET /metrics)")
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+def record_run_counts(rows, license_texts, license_index):
+    license_ids = {license_id for resolved in LICENSE_RESOLUTIONS.values() for license_id in resolved.license_ids if license_id != 'Unknown'}
+    METRICS.count('counts.components', len(rows))
+    METRICS.count('counts.distinct_license_entries', len(LICENSE_ENTRIES))
+    METRICS.count('counts.distinct_license_ids', len(license_ids))
+    METRICS.count('counts.unresolved_names', len(unmatched_license_names(license_index)))
+    METRICS.count('counts.license_texts', len(license_texts))
+
+def write_metrics(filename):
+    with open(filename, "w") as metrics_file:
+        json.dump(METRICS.to_dict(), metrics_file, indent=2)
+
+def configure_run(args):
+    global LICENSE_NAME_TO_ID_MAP
+    LICENSE_NAME_TO_ID_MAP = load_license_name_to_id_map(args.mapping_file)
+    clear_resolution_cache()
+
+    FETCH_SETTINGS.update({
+        'backend': args.fetch_backend,
+        'workers': max(1, args.fetch_workers),
+        'timeout': args.timeout,
+        'retries': max(0, args.retries),
+    })
+    RESOLVE_SETTINGS.update({
+        'executor': args.executor,
+        'workers': args.resolve_workers or os.cpu_count() or 1,
+        'chunk_size': args.chunk_size,
+    })
+    CACHE_SETTINGS.update({
+        'dir': None if args.no_cache else args.cache_dir,
+        'ttl': args.cache_ttl,
+        'offline': args.offline,
+        'refresh': args.refresh,
+        'version': args.spdx_version,
+    })
+
+def load_spdx_lists(args):
+    """Fetch the SPDX license and exception lists and return their lookups; raises SPDXDataError when offline without them."""
+    licenses_url, exceptions_url = spdx_data_urls(args.spdx_version)
+    if args.spdx_data_url:
+        licenses_url = urljoin(args.spdx_data_url, "licenses.json")
+        exceptions_url = urljoin(args.spdx_data_url, "exceptions.json")
+    # A custom data URL serves its own detail documents, so only rewrite them for the upstream repository
+    details_version = 'main' if args.spdx_data_url else args.spdx_version
+    with METRICS.stage('spdx_lists'):
+        licenses_data = fetch_data(licenses_url)
+        exceptions_data = fetch_data(exceptions_url)
+    if CACHE_SETTINGS['offline']:
+        # Offline runs are explicit about using the cache; without the lists every license would report as unknown
+        for url, data in ((licenses_url, licenses_data), (exceptions_url, exceptions_data)):
+            if not data:
+                raise SPDXDataError(f"{url} is not in the cache; run once without --offline to fill it")
+    licenses_lookup = build_licenses_lookup(licenses_data.get('licenses', []), details_version)
+    exceptions_lookup = build_exceptions_lookup(exceptions_data.get('exceptions', []), details_version)
+    return licenses_lookup, exceptions_lookup
+
+def load_spdx_tables(args):
+    licenses_lookup, exceptions_lookup = load_spdx_lists(args)
+    with METRICS.stage('license_index'):
+        license_index = load_license_index(licenses_lookup, exceptions_lookup)
+    return licenses_lookup, exceptions_lookup, license_index
+
+def store_license_texts(args, license_texts):
+    if args.license_texts_dir:
+        written = write_license_text_store(args.license_texts_dir, license_texts, args.license_texts_compress)
+        METRICS.count('counts.license_texts_stored', written)
+        print(f"{written} new license texts stored in {args.license_texts_dir}.")
+
+def check_policy(policy, rows, licenses_lookup, exceptions_lookup, fail_on, violations_file):
+    with METRICS.stage('policy'):
+        policy_report = policy.evaluate(rows, licenses_lookup, exceptions_lookup, fail_on)
+    for status in POLICY_STATUSES:
+        METRICS.count(f'policy.{status}', policy_report['summary'][status])
+    write_violations(violations_file, policy_report)
+    print(f"{policy_report['summary']['deny']} denied and {policy_report['summary']['review']} components to review, {violations_file} created successfully.")
+    return policy_report
+
+def write_name_suggestions(args, license_index):
+    if args.suggest_names:
+        suggestions = suggest_license_names(license_index)
+        with open(args.suggest_names, "w") as suggestions_file:
+            json.dump(suggestions, suggestions_file, indent=2)
+        print(f"{len(suggestions)} unmapped license names, {args.suggest_names} created successfully.")
+
+def load_batch_manifest(manifest_file):
+    """Load and validate a batch manifest; relative paths are relative to the manifest's directory.
+
+    Raises OSError or ValueError.
+    """
+    with open(manifest_file, 'r') as file:
+        manifest = json.load(file)
+    projects = manifest.get('projects') if isinstance(manifest, dict) else None
+    if not isinstance(projects, list) or not projects:
+        raise ValueError("the manifest must have a non-empty 'projects' list")
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    names = set()
+    loaded = []
+    for project in projects:
+        if not isinstance(project, dict) or not isinstance(project.get('name'), str) or not isinstance(project.get('sbom_dir'), str):
+            raise ValueError("every project needs a 'name' and an 'sbom_dir'")
+        if project['name'] in names:
+            raise ValueError(f"duplicate project name '{project['name']}'")
+        names.add(project['name'])
+        loaded.append({
+            'name': project['name'],
+            'sbom_dir': os.path.join(base_dir, project['sbom_dir']),
+            'output_dir': os.path.join(base_dir, project.get('output_dir', project['name'])),
+        })
+    return loaded
+
+def load_batch_components(projects, streaming=False, workers=1):
+    """Ingest every project and return the unique components by key, plus each project's component keys.
+
+    A component shipped by many projects is stored and resolved once. Projects whose SBOMs disagree
+    on a component's licenses or VCS URL keep their own copy, keyed by (key, project name), so one
+    project's SBOMs never change another project's report.
+    """
+    components = {}
+    project_keys = []
+    for project in projects:
+        keys = []
+        for key, component in iter_sbom_components(project['sbom_dir'], streaming=streaming, workers=workers):
+            shared = components.setdefault(key, component)
+            if shared is not component and (shared.licenses != component.licenses or shared.vcs_url != component.vcs_url):
+                key = (key, project['name'])
+                components[key] = component
+            keys.append(key)
+        project_keys.append(keys)
+    return components, project_keys
+
+def write_batch_project(position):
+    output_dir, rows, license_texts, html_report, html_compress = BATCH_PROJECTS[position]
+    write_reports(output_dir, rows, license_texts, html_report, html_compress)
+    return output_dir
+
+def write_batch_reports(projects, workers):
+    """Write the reports of all batch projects in parallel.
+
+    Like the resolver pool, writer processes are forked and inherit the projects' rows and license
+    texts from BATCH_PROJECTS, so a task is just the project's position; without fork, threads write.
+    """
+    workers = max(1, min(workers, len(projects)))
+    BATCH_PROJECTS[:] = projects
+    try:
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        with executor:
+            list(executor.map(write_batch_project, range(len(projects))))
+    finally:
+        BATCH_PROJECTS.clear()
+
+def build_projects_license_index(projects, project_rows):
+    """Return which projects ship which licenses and exceptions, with the number of components using each."""
+    labels_by_set = {}
+    licenses = {}
+    exceptions = {}
+    summaries = {}
+    for project, rows in zip(projects, project_rows):
+        license_counts = {}
+        exception_counts = {}
+        for row in rows:
+            set_key = tuple(id(resolved) for resolved in row.licenses)
+            labels = labels_by_set.get(set_key)
+            if labels is None:
+                items = {(kind, label) for resolved in row.licenses for kind, label, _ in resolved.items}
+                labels = labels_by_set[set_key] = ([label for kind, label in items if kind == 'License'], [label for kind, label in items if kind == 'Exception'])
+            for label in labels[0]:
+                license_counts[label] = license_counts.get(label, 0) + 1
+            for label in labels[1]:
+                exception_counts[label] = exception_counts.get(label, 0) + 1
+        for label, count in license_counts.items():
+            licenses.setdefault(label, {})[project['name']] = count
+        for label, count in exception_counts.items():
+            exceptions.setdefault(label, {})[project['name']] = count
+        summaries[project['name']] = {
+            'sbom_dir': project['sbom_dir'],
+            'output_dir': project['output_dir'],
+            'components': len(rows),
+            'licenses': dict(sorted(license_counts.items())),
+            'exceptions': dict(sorted(exception_counts.items())),
+        }
+    return {
+        'licenses': {label: licenses[label] for label in sorted(licenses)},
+        'exceptions': {label: exceptions[label] for label in sorted(exceptions)},
+        'projects': summaries,
     }
 
-    components = load_sbom_files(sbom_dir)
-    license_report, license_report_html, license_texts = generate_reports(components, licenses_lookup, exceptions_lookup)
-    write_text_report("license_compliance.txt", license_report)
-    write_html_report("license_compliance.html", license_report_html)
-    write_license_texts("licenses_text.txt", "licenses_text.html", license_texts)
+def run_batch(args):
+    """Generate the reports of every project in a batch manifest from one shared resolution context."""
+    configure_run(args)
+    licenses_lookup, exceptions_lookup, license_index = load_spdx_tables(args)
+    projects = args.batch_projects
+
+    with METRICS.stage('ingest'):
+        components, project_keys = load_batch_components(projects, streaming=args.streaming, workers=args.ingest_workers or os.cpu_count() or 1)
+    total_components = sum(len(keys) for keys in project_keys)
+    print(f"Batch of {len(projects)} projects: {len(components)} unique components of {total_components} in total.")
+    with METRICS.stage('resolve'):
+        keyed_rows, targets = resolve_keyed_components(components, licenses_lookup, exceptions_lookup)
+    with METRICS.stage('license_texts'):
+        license_texts = prefetch_license_texts(targets)
+    rows_by_key = dict(keyed_rows)
+    record_run_counts(keyed_rows, license_texts, license_index)
+    METRICS.count('counts.projects', len(projects))
+    METRICS.count('counts.project_components', total_components)
+
+    # Every project takes its rows and license texts from the shared tables, in the order a run of its own would use
+    project_rows = []
+    batch_projects = []
+    for project, keys in zip(projects, project_keys):
+        project_rows.append([rows_by_key[key] for key in keys if key in rows_by_key])
+        project_targets = collect_license_text_targets({key: components[key] for key in keys if key in rows_by_key}, licenses_lookup, exceptions_lookup)
+        project_texts = {key: license_texts[key] for key in project_targets if key in license_texts}
+        os.makedirs(project['output_dir'], exist_ok=True)
+        batch_projects.append((project['output_dir'], project_rows[-1], project_texts, args.html_report, args.html_compress))
+
+    with METRICS.stage('write'):
+        write_batch_reports(batch_projects, args.batch_workers or os.cpu_count() or 1)
+        store_license_texts(args, license_texts)
+        with open(args.batch_index, "w") as index_file:
+            json.dump(build_projects_license_index(projects, project_rows), index_file, indent=2)
+    print(f"Reports of {len(projects)} projects and {args.batch_index} created successfully.")
+
+    failed = []
+    if args.policy:
+        policy = LicensePolicy(args.policy_rules, license_index, exceptions_lookup)
+        for project, rows in zip(projects, project_rows):
+            violations_file = os.path.join(project['output_dir'], args.violations_file)
+            if check_policy(policy, rows, licenses_lookup, exceptions_lookup, args.fail_on, violations_file)['summary']['failed']:
+                failed.append(project['name'])
+    write_name_suggestions(args, license_index)
+    if failed:
+        print(f"License policy violated by {len(failed)} projects: {', '.join(failed)}.")
+        return POLICY_FAILURE_EXIT_CODE
+    return 0
+
+def run_report(args):
+    sbom_dir = args.sbom_dir
+    configure_run(args)
+    licenses_lookup, exceptions_lookup, license_index = load_spdx_tables(args)
+
+    ingest_workers = args.ingest_workers or os.cpu_count() or 1
+    report_files = ("license_compliance.txt", "license_compliance.html", "licenses_text.txt", "licenses_text.html")
+    if args.license_texts_dir:
+        report_files += (os.path.join(args.license_texts_dir, LICENSE_TEXTS_INDEX_FILE),)
+    if args.policy:
+        report_files += (args.violations_file,)
+    if args.suggest_names:
+        report_files += (args.suggest_names,)
+    state = None
+    if args.state_dir:
+        with METRICS.stage('state'):
+            state = load_run_state(args.state_dir)
+            changes = refresh_sbom_state(sbom_dir, args.state_dir, state, streaming=args.streaming, workers=ingest_workers)
+        fingerprint = resolution_fingerprint(licenses_lookup, exceptions_lookup)
+        output_options = {'html_report': args.html_report, 'html_compress': args.html_compress,
+                          'license_texts_dir': args.license_texts_dir, 'license_texts_compress': args.license_texts_compress,
+                          'policy': file_content_hash(args.policy) if args.policy else None, 'fail_on': args.fail_on,
+                          'suggest_names': args.suggest_names}
+        print(f"Incremental run: {len(changes['changed'])} of {len(state['files'])} SBOM files changed, {len(changes['removed'])} removed.")
+
+        # Reports are only written by a completed run, which is what records the output options
+        if (not changes['changed'] and not changes['removed'] and state.get('fingerprint') == fingerprint
+                and state.get('outputs') == output_options and all(os.path.exists(report_file) for report_file in report_files)):
+            write_license_diff(args.diff_file, diff_license_summaries({}, {}))
+            if changes['rehashed']:
+                save_run_state(args.state_dir, state)
+            print(f"No changes since the previous run; reports are up to date, {args.diff_file} created successfully.")
+            if args.policy and read_state_json(args.violations_file, {}).get('summary', {}).get('failed'):
+                print(f"License policy violated, see {args.violations_file}.")
+                return POLICY_FAILURE_EXIT_CODE
+            return 0
+
+        restore_license_resolutions(state, fingerprint, exceptions_lookup)
+        components = iter_state_components(args.state_dir, state, streaming=args.streaming)
+    else:
+        components = iter_sbom_components(sbom_dir, streaming=args.streaming, workers=ingest_workers)
+    # Streamed components are parsed while they are resolved; the 'sbom_load' timer has the parsing share
+    with METRICS.stage('resolve'):
+        rows, targets = resolve_components(components, licenses_lookup, exceptions_lookup)
+    with METRICS.stage('license_texts'):
+        license_texts = prefetch_license_texts(targets)
+    record_run_counts(rows, license_texts, license_index)
+
+    if state is not None:
+        summaries_path = state_entry_path(args.state_dir, STATE_SUMMARIES_FILE)
+        summaries = component_license_summaries(rows)
+        write_license_diff(args.diff_file, diff_license_summaries(read_state_json(summaries_path, {}), summaries))
+        state['outputs'] = output_options
+        store_license_resolutions(state, fingerprint)
+
+    with METRICS.stage('write'):
+        write_reports(".", rows, license_texts, args.html_report, args.html_compress)
+        store_license_texts(args, license_texts)
+    policy_report = None
+    if args.policy:
+        policy = LicensePolicy(args.policy_rules, license_index, exceptions_lookup)
+        policy_report = check_policy(policy, rows, licenses_lookup, exceptions_lookup, args.fail_on, args.violations_file)
+    write_name_suggestions(args, license_index)
+    # Saved last, so an interrupted run never leaves state that claims reports it did not write
+    if state is not None:
+        with METRICS.stage('state'):
+            write_state_json(summaries_path, summaries)
+            save_run_state(args.state_dir, state)
+        print(f"{args.diff_file} created successfully.")
     print("license_compliance.txt, license_compliance.html, licenses_text.txt, and licenses_text.html created successfully.")
+    if policy_report is not None and policy_report['summary']['failed']:
+        print(f"License policy violated, see {args.violations_file}.")
+        return POLICY_FAILURE_EXIT_CODE
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate license compliance reports from SBOM JSON files.')
+    parser.add_argument('--sbom-dir', type=str, default='sboms', help='Directory containing SBOM JSON files (default: sboms)')
+    parser.add_argument('--mapping-file', type=str, help='Optional JSON file to map complex license names to SPDX IDs')
+    parser.add_argument('--streaming', action='store_true', help='Read SBOM components one at a time to keep memory use constant for very large files')
+    parser.add_argument('--ingest-workers', type=int, default=1, help='Number of processes parsing SBOM files in parallel, 0 for one per CPU (default: 1)')
+    parser.add_argument('--executor', choices=RESOLVE_EXECUTORS, default='serial', help='Resolve distinct license entries serially, in a thread pool or in a process pool (default: serial)')
+    parser.add_argument('--resolve-workers', type=int, default=0, help='Number of resolver threads or processes, 0 for one per CPU (default: 0)')
+    parser.add_argument('--chunk-size', type=int, default=RESOLVE_CHUNK_SIZE, help=f'License entries per resolver task (default: {RESOLVE_CHUNK_SIZE})')
+    parser.add_argument('--policy', type=str, metavar='FILE', help='Check every component against the allow, review and deny rules in this JSON file')
+    parser.add_argument('--violations-file', type=str, default=VIOLATIONS_FILE, help=f'With --policy, where to write the components that violate it, relative to each project output directory with --batch-manifest (default: {VIOLATIONS_FILE})')
+    parser.add_argument('--fail-on', choices=['deny', 'review'], default='deny', help=f'With --policy, exit with status {POLICY_FAILURE_EXIT_CODE} if a component is denied, or also if one needs review (default: deny)')
+    parser.add_argument('--suggest-names', type=str, metavar='FILE', help='Write SPDX ID suggestions for license names that could not be mapped to this JSON file')
+    parser.add_argument('--metrics-file', type=str, metavar='FILE', help='Write stage timings, HTTP, cache and license counters of the run to this JSON file')
+    parser.add_argument('--profile', type=str, nargs='?', const='generate_profile', metavar='PREFIX', help='Profile the run with cProfile and write PREFIX.prof and a Chrome trace PREFIX.trace.json (default prefix: generate_profile)')
+    parser.add_argument('--batch-manifest', type=str, metavar='FILE', help='Generate the reports of every project in this JSON manifest, resolving components shared between projects once')
+    parser.add_argument('--batch-workers', type=int, default=0, help='Number of processes writing batch project reports, 0 for one per CPU (default: 0)')
+    parser.add_argument('--batch-index', type=str, default=BATCH_INDEX_FILE, help=f'With --batch-manifest, where to write which projects ship which licenses (default: {BATCH_INDEX_FILE})')
+    parser.add_argument('--serve', action='store_true', help='Run as a server that generates reports for uploaded SBOMs, keeping the SPDX data warm')
+    parser.add_argument('--host', type=str, default=SERVE_HOST, help=f'Address for --serve to listen on (default: {SERVE_HOST})')
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help=f'Port for --serve to listen on, 0 for any free port (default: {SERVE_PORT})')
+    parser.add_argument('--unix-socket', type=str, metavar='PATH', help='Make --serve listen on a Unix socket instead of a TCP port')
+    parser.add_argument('--html-report', choices=['table', 'virtual'], default='table', help='Render every row into the HTML report, or embed the data and render only the visible rows (default: table)')
+    parser.add_argument('--html-compress', action='store_true', help='Embed the virtual HTML report data and the license texts in licenses_text.html as gzip+base64')
+    parser.add_argument('--license-texts-dir', type=str, metavar='DIR', help='Also store every distinct license text once in this directory, named by its SHA-256, with an index.json of the IDs')
+    parser.add_argument('--license-texts-compress', choices=list(LICENSE_TEXTS_COMPRESSIONS), help='Compress the texts in --license-texts-dir with gzip or brotli (brotli needs the brotli package)')
+    parser.add_argument('--state-dir', type=str, help='Keep SBOM hashes and resolved licenses here and only reprocess what changed since the previous run')
+    parser.add_argument('--diff-file', type=str, default=DIFF_FILE, help=f'With --state-dir, where to write the components added, removed and relicensed since the previous run (default: {DIFF_FILE})')
+    parser.add_argument('--cache-dir', type=str, default=CACHE_DIR, help=f'Directory for cached SPDX data (default: {CACHE_DIR})')
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL, help=f'Seconds before cached SPDX data is revalidated (default: {CACHE_TTL})')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the SPDX cache')
+    parser.add_argument('--offline', action='store_true', help='Use only cached SPDX data and never access the network')
+    parser.add_argument('--refresh', action='store_true', help='Download SPDX data again even if the cached copy is fresh')
+    parser.add_argument('--spdx-version', type=str, default='main', help='SPDX license list version to use, e.g. 3.24.0 (default: main)')
+    parser.add_argument('--spdx-data-url', type=str, help='Base URL serving licenses.json and exceptions.json, e.g. a local mirror or spdx_stub_server.py')
+    parser.add_argument('--fetch-backend', choices=['threads', 'async'], default='threads', help='Download SPDX data with a thread pool or with asyncio (default: threads)')
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS, help=f'Number of concurrent license text downloads (default: {FETCH_WORKERS})')
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help=f'Timeout in seconds for each SPDX request (default: {REQUEST_TIMEOUT})')
+    parser.add_argument('--retries', type=int, default=FETCH_RETRIES, help=f'Retries with backoff for failed SPDX requests (default: {FETCH_RETRIES})')
+    args = parser.parse_args(argv)
+
+    if args.offline and args.refresh:
+        parser.error('--offline and --refresh cannot be used together')
+    if args.offline and args.no_cache:
+        parser.error('--offline requires the cache')
+    if args.license_texts_compress == 'brotli' and brotli is None:
+        parser.error('--license-texts-compress brotli requires the brotli package')
+    if args.batch_manifest and (args.serve or args.state_dir):
+        parser.error('--batch-manifest cannot be used with --serve or --state-dir')
+    if args.serve and args.executor == 'process':
+        # Forking from a request thread could copy a lock another request holds into the workers
+        parser.error('--executor process cannot be used with --serve; use serial or thread')
+    args.batch_projects = None
+    if args.batch_manifest:
+        try:
+            args.batch_projects = load_batch_manifest(args.batch_manifest)
+        except (OSError, ValueError) as e:
+            parser.error(f"invalid --batch-manifest file {args.batch_manifest}: {e}")
+    args.policy_rules = None
+    if args.policy:
+        try:
+            args.policy_rules = load_policy_rules(args.policy)
+        except (OSError, ValueError) as e:
+            parser.error(f"invalid --policy file {args.policy}: {e}")
+
+    global METRICS
+    METRICS = Metrics(trace=bool(args.profile))
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    exit_code = 0
+    try:
+        if args.serve:
+            serve(args)
+        elif args.batch_manifest:
+            exit_code = run_batch(args)
+        else:
+            exit_code = run_report(args)
+    except SPDXDataError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit_code = 1
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(f"{args.profile}.prof")
+            with open(f"{args.profile}.trace.json", "w") as trace_file:
+                json.dump(METRICS.chrome_trace(), trace_file)
+            print(f"{args.profile}.prof and {args.profile}.trace.json created successfully.")
+        if args.metrics_file:
+            write_metrics(args.metrics_file)
+            print(f"{args.metrics_file} created successfully.")
+    if exit_code:
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
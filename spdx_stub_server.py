@@ -0,0 +1,178 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the SPDX license-list-data JSON endpoints, so generate.py can be
+# exercised and measured without network access.
+
+SPDX_ID_FAMILIES = ["MIT", "Apache", "GPL", "LGPL", "BSD", "MPL", "EPL", "CDDL", "AGPL", "ISC"]
+
+def synthetic_license_ids(count):
+    return [f"{SPDX_ID_FAMILIES[i % len(SPDX_ID_FAMILIES)]}-Stub-{i}.0" for i in range(count)]
+
+def synthetic_exception_ids(count):
+    return [f"Stub-exception-{i}.0" for i in range(count)]
+
+def build_dataset(base_url, license_count, exception_count, data_dir=None):
+    if data_dir:
+        return load_dataset(base_url, data_dir)
+
+    documents = {}
+    licenses = []
+    for i, license_id in enumerate(synthetic_license_ids(license_count)):
+        name = f"{license_id.replace('-', ' ')} License"
+        licenses.append({
+            "reference": f"https://spdx.org/licenses/{license_id}.html",
+            "isDeprecatedLicenseId": False,
+            "detailsUrl": f"{base_url}details/{license_id}.json",
+            "referenceNumber": i,
+            "name": name,
+            "licenseId": license_id,
+            "seeAlso": [],
+            "isOsiApproved": i % 2 == 0,
+        })
+        text = f"{name}\n\n" + "Permission is hereby granted, subject to the following conditions.\n" * 40
+        documents[f"details/{license_id}.json"] = {
+            "licenseId": license_id,
+            "name": name,
+            "licenseText": text,
+            "licenseTextHtml": "<div>" + "".join(f"<p>{line}</p>" for line in text.splitlines() if line) + "</div>",
+        }
+
+    exceptions = []
+    for i, exception_id in enumerate(synthetic_exception_ids(exception_count)):
+        name = exception_id.replace('-', ' ')
+        # The SPDX exceptions list swaps 'reference' and 'detailsUrl' compared to the licenses list
+        exceptions.append({
+            "reference": f"{base_url}exceptions/{exception_id}.json",
+            "isDeprecatedLicenseId": False,
+            "detailsUrl": f"https://spdx.org/licenses/{exception_id}.html",
+            "referenceNumber": i,
+            "name": name,
+            "licenseExceptionId": exception_id,
+            "seeAlso": [],
+        })
+        documents[f"exceptions/{exception_id}.json"] = {
+            "licenseExceptionId": exception_id,
+            "name": name,
+            "licenseExceptionText": f"{name} text",
+            "exceptionTextHtml": f"<p>{name} text</p>",
+        }
+
+    documents["licenses.json"] = {"licenseListVersion": "stub", "licenses": licenses}
+    documents["exceptions.json"] = {"licenseListVersion": "stub", "exceptions": exceptions}
+    return documents
+
+def load_dataset(base_url, data_dir):
+    # Serve a local checkout of license-list-data/json, pointing detail URLs at this server
+    def read(path):
+        with open(f"{data_dir}/{path}", "r") as file:
+            return json.load(file)
+
+    licenses = read("licenses.json")
+    for license in licenses.get("licenses", []):
+        license["detailsUrl"] = f"{base_url}details/{license['licenseId']}.json"
+    exceptions = read("exceptions.json")
+    for exception in exceptions.get("exceptions", []):
+        exception["reference"] = f"{base_url}exceptions/{exception['licenseExceptionId']}.json"
+
+    documents = {"licenses.json": licenses, "exceptions.json": exceptions}
+    for license in licenses.get("licenses", []):
+        path = f"details/{license['licenseId']}.json"
+        try:
+            documents[path] = read(path)
+        except OSError:
+            pass
+    for exception in exceptions.get("exceptions", []):
+        path = f"exceptions/{exception['licenseExceptionId']}.json"
+        try:
+            documents[path] = read(path)
+        except OSError:
+            pass
+    return documents
+
+def make_handler(documents, latency, stats):
+    bodies = {}
+    for path, document in documents.items():
+        body = json.dumps(document).encode("utf-8")
+        bodies["/" + path] = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle's algorithm the body of a kept-alive
+        # response waits for the client's delayed ACK, adding ~40 ms to every request
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with stats["lock"]:
+                stats["requests"] += 1
+            if latency:
+                time.sleep(latency)
+
+            path = self.path.split("?", 1)[0]
+            if path not in bodies:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body, etag = bodies[path]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of hundreds of concurrent connections without dropping SYNs
+    request_queue_size = 1024
+
+def start_stub_server(host="127.0.0.1", port=0, license_count=500, exception_count=50, latency=0.0, data_dir=None):
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = StubHTTPServer((host, port), BaseHTTPRequestHandler)
+    base_url = f"http://{host}:{server.server_address[1]}/"
+    documents = build_dataset(base_url, license_count, exception_count, data_dir)
+    server.RequestHandlerClass = make_handler(documents, latency, stats)
+    server.base_url = base_url
+    server.stats = stats
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve SPDX license list JSON endpoints locally for testing and benchmarking.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--licenses', type=int, default=500, help='Number of synthetic licenses to serve (default: 500)')
+    parser.add_argument('--exceptions', type=int, default=50, help='Number of synthetic exceptions to serve (default: 50)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial latency per request in milliseconds (default: 0)')
+    parser.add_argument('--data-dir', type=str, help='Serve a local license-list-data/json checkout instead of synthetic data')
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.licenses, args.exceptions, args.latency / 1000.0, args.data_dir)
+    print(f"Serving SPDX stub data at {server.base_url} (use --spdx-data-url {server.base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served {server.stats['requests']} requests.")
+
+if __name__ == "__main__":
+    main()
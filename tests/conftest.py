@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# generate.py and spdx_stub_server.py are scripts, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate
+import spdx_stub_server
+
+STUB_LICENSES = 20
+STUB_EXCEPTIONS = 5
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server = spdx_stub_server.start_stub_server(license_count=STUB_LICENSES, exception_count=STUB_EXCEPTIONS)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(scope="session")
+def spdx_lookups(stub_server):
+    documents = spdx_stub_server.build_dataset(stub_server.base_url, STUB_LICENSES, STUB_EXCEPTIONS)
+    licenses_lookup = generate.build_licenses_lookup(documents["licenses.json"]["licenses"])
+    exceptions_lookup = generate.build_exceptions_lookup(documents["exceptions.json"]["exceptions"])
+    return licenses_lookup, exceptions_lookup
+
+@pytest.fixture(scope="session")
+def aliased_lookups(spdx_lookups):
+    """The stub lookups plus a deprecated 'Legacy-Stub-1.0' family laid out like SPDX's GPL-2.0 IDs."""
+    licenses_lookup, exceptions_lookup = spdx_lookups
+    licenses_lookup = dict(licenses_lookup)
+    for license_id, name, deprecated in [
+        ("Legacy-Stub-1.0", "Legacy Stub License v1.0 only", True),
+        ("Legacy-Stub-1.0+", "Legacy Stub License v1.0 or later", True),
+        ("Legacy-Stub-1.0-only", "Legacy Stub License v1.0 only", False),
+        ("Legacy-Stub-1.0-or-later", "Legacy Stub License v1.0 or later", False),
+    ]:
+        licenses_lookup[license_id] = {
+            "reference": f"https://spdx.org/licenses/{license_id}.html",
+            "isDeprecatedLicenseId": deprecated,
+            "name": name,
+            "licenseId": license_id,
+        }
+    return licenses_lookup, exceptions_lookup
@@ -0,0 +1,184 @@
+import asyncio
+import gzip
+import json
+from urllib.parse import urlsplit
+
+import pytest
+
+import generate
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def host_key(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.hostname, parts.port
+
+class RawServer:
+    """One-off asyncio HTTP server whose handler writes raw responses, for framings the stub server does not produce."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.connections = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        request_index = 0
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                response = self.respond(self.connections, request_index, request)
+                if response is None:
+                    break
+                writer.write(response)
+                await writer.drain()
+                request_index += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def chunked_response(body, chunk_size, headers=b""):
+    chunks = b"".join(b"%x;ext=1\r\n%s\r\n" % (len(body[start:start + chunk_size]), body[start:start + chunk_size])
+                      for start in range(0, len(body), chunk_size))
+    return (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n" + headers + b"\r\n"
+            + chunks + b"0\r\nX-Trailer: done\r\n\r\n")
+
+def test_pool_reuses_kept_alive_connection(stub_server):
+    async def fetch():
+        pool = generate.AsyncConnectionPool(4, 5)
+        try:
+            first = await pool.get(stub_server.base_url + "licenses.json", {})
+            connection = pool.idle[host_key(stub_server.base_url)][-1]
+            second = await pool.get(stub_server.base_url + "exceptions.json", {})
+            return first, second, connection, pool.idle[host_key(stub_server.base_url)]
+        finally:
+            await pool.close()
+
+    (status, _, body), (second_status, _, _), connection, idle = run(fetch())
+    assert status == 200 and second_status == 200
+    assert len(json.loads(body)["licenses"]) == 20
+    assert idle == [connection]
+
+def test_pool_not_modified_and_not_found(stub_server):
+    async def fetch():
+        pool = generate.AsyncConnectionPool(4, 5)
+        try:
+            _, headers, _ = await pool.get(stub_server.base_url + "licenses.json", {})
+            not_modified = await pool.get(stub_server.base_url + "licenses.json", {"If-None-Match": headers["etag"]})
+            not_found = await pool.get(stub_server.base_url + "missing.json", {})
+            return not_modified, not_found, len(pool.idle[host_key(stub_server.base_url)])
+        finally:
+            await pool.close()
+
+    (status, _, body), (missing_status, _, _), idle = run(fetch())
+    assert (status, body) == (304, b"")
+    assert missing_status == 404
+    # Bodiless responses leave the connection reusable
+    assert idle == 1
+
+def test_fetch_documents_async_reports_errors_per_url(stub_server, monkeypatch):
+    monkeypatch.setitem(generate.CACHE_SETTINGS, 'dir', None)
+    monkeypatch.setitem(generate.FETCH_SETTINGS, 'retries', 0)
+    urls = [stub_server.base_url + "licenses.json", stub_server.base_url + "missing.json"]
+    results = run(generate.fetch_documents_async(urls, lambda url, data, error: (data, error)))
+    data, error = results[urls[0]]
+    assert error is None and len(data["licenses"]) == 20
+    data, error = results[urls[1]]
+    assert data is None and isinstance(error, generate.AsyncHTTPError)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_pool_reads_chunked_body_and_keeps_connection(chunk_size):
+    body = json.dumps({"licenses": [{"licenseId": f"ID-{i}"} for i in range(50)]}).encode()
+
+    async def fetch():
+        async with RawServer(lambda connection, index, request: chunked_response(body, chunk_size)) as server:
+            pool = generate.AsyncConnectionPool(4, 5)
+            try:
+                responses = [await pool.get(server.url + "licenses.json", {}) for _ in range(3)]
+            finally:
+                await pool.close()
+            return responses, server.connections
+
+    responses, connections = run(fetch())
+    assert [response_body for _, _, response_body in responses] == [body] * 3
+    # The trailer is consumed, so the next response is read from the same connection
+    assert connections == 1
+
+def test_pool_decompresses_gzip_chunked_body():
+    body = json.dumps({"exceptions": []}).encode()
+
+    async def fetch():
+        response = chunked_response(gzip.compress(body), 16, b"Content-Encoding: gzip\r\n")
+        async with RawServer(lambda connection, index, request: response) as server:
+            pool = generate.AsyncConnectionPool(1, 5)
+            try:
+                return await pool.get(server.url + "exceptions.json", {})
+            finally:
+                await pool.close()
+
+    status, _, response_body = run(fetch())
+    assert (status, response_body) == (200, body)
+
+def test_pool_retries_request_on_dropped_kept_alive_connection():
+    body = b'{"ok": true}'
+    response = b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+
+    def respond(connection, index, request):
+        # Each connection answers one request, then closes on the next without a response,
+        # like a server timing out an idle keep-alive connection just as it is reused
+        return response if index == 0 else None
+
+    async def fetch():
+        async with RawServer(respond) as server:
+            pool = generate.AsyncConnectionPool(1, 5)
+            try:
+                results = [await pool.get(server.url, {}) for _ in range(2)]
+            finally:
+                await pool.close()
+            return results, server.connections
+
+    results, connections = run(fetch())
+    assert [result[2] for result in results] == [body, body]
+    assert connections == 2
+
+def test_pool_does_not_retry_fresh_connection():
+    async def fetch():
+        async with RawServer(lambda connection, index, request: None) as server:
+            pool = generate.AsyncConnectionPool(1, 5)
+            try:
+                with pytest.raises(ConnectionError):
+                    await pool.get(server.url, {})
+            finally:
+                await pool.close()
+            return server.connections
+
+    assert run(fetch()) == 1
+
+def test_revalidation_with_malformed_body_keeps_cached_copy(tmp_path, monkeypatch):
+    monkeypatch.setitem(generate.CACHE_SETTINGS, 'dir', str(tmp_path))
+    monkeypatch.setitem(generate.CACHE_SETTINGS, 'ttl', 0)
+    monkeypatch.setitem(generate.FETCH_SETTINGS, 'retries', 0)
+    body = b'{"licenses": ['
+
+    async def fetch():
+        response = b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+        async with RawServer(lambda connection, index, request: response) as server:
+            url = server.url + "licenses.json"
+            generate.store_cached_json(url, {"licenses": []}, {'url': url, 'etag': '"stale"'})
+            pool = generate.AsyncConnectionPool(1, 5)
+            try:
+                return await generate.fetch_cached_json_async(pool, url, [])
+            finally:
+                await pool.close()
+
+    assert run(fetch()) == {"licenses": []}
@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import generate
+
+class TrickleFile:
+    """Text file that returns at most `size` characters per read, so values straddle every chunk boundary."""
+
+    def __init__(self, text, size):
+        self.file = io.StringIO(text)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.file.read(self.size if size < 0 else min(size, self.size))
+
+DOCUMENT = {
+    "bomFormat": "CycloneDX",
+    "metadata": {"component": {"name": "app"}, "components": [{"name": "not top level"}], "note": "]}, \"components\": ["},
+    "components": [
+        {"group": "org.a", "name": "a", "version": "1.0", "licenses": [{"license": {"id": "MIT"}}]},
+        12345,
+        -1.5e-3,
+        True,
+        None,
+        "quote \" and \\ backslash, café € \U0001f600",
+        {"group": "org.b", "name": "b", "version": "2.0", "components": [{"group": "org.c", "name": "c", "version": "3.0"}]},
+        [],
+        {},
+    ],
+    "dependencies": [{"ref": "a"}],
+}
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 20])
+def test_stream_json_array_chunk_boundaries(size):
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    assert list(generate.stream_json_array(TrickleFile(text, size), "components")) == DOCUMENT["components"]
+
+@pytest.mark.parametrize("size", [1, 5])
+def test_stream_json_array_pretty_printed(size):
+    text = json.dumps(DOCUMENT, indent=4)
+    assert list(generate.stream_json_array(TrickleFile(text, size), "components")) == DOCUMENT["components"]
+
+@pytest.mark.parametrize("text, expected", [
+    ('{}', []),
+    ('{"components": []}', []),
+    ('{"components": [ ]  }', []),
+    ('{"metadata": {"components": [1]}}', []),
+    # A non-array value under the key is skipped like any other member
+    ('{"components": {"x": [1]}, "other": 2}', []),
+    ('{"components": [1, 23], "trailing": "ignored'  , [1, 23]),
+])
+def test_stream_json_array_edge_cases(text, expected):
+    assert list(generate.stream_json_array(TrickleFile(text, 1), "components")) == expected
+
+@pytest.mark.parametrize("text", [
+    '[]',
+    '{"components": [1, }',
+    '{"components": [1 2]}',
+    '{"components": [1, 2',
+    '{"components" [1]}',
+])
+def test_stream_json_array_malformed(text):
+    with pytest.raises(ValueError):
+        list(generate.stream_json_array(TrickleFile(text, 2), "components"))
+
+def test_json_stream_number_at_chunk_end():
+    # '12' fills the first chunk exactly; the number continues in the next one
+    stream = generate.JSONStream(TrickleFile('12345 true', 2), chunk_size=2)
+    assert stream.decode() == 12345
+    assert stream.decode() is True
+    assert stream.peek() == ""
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_json_stream_fraction_and_exponent_across_chunks(chunk_size):
+    # Every split of '2.5' and '-1e+3', e.g. a chunk ending in '2.' must not decode as 2
+    stream = generate.JSONStream(io.StringIO('[100, 2.5, -1e+3]'), chunk_size=chunk_size)
+    stream.expect("[")
+    values = [stream.decode()]
+    while stream.peek() == ",":
+        stream.expect(",")
+        values.append(stream.decode())
+    stream.expect("]")
+    assert values == [100, 2.5, -1000.0]
+
+def test_load_sbom_file_streaming_matches_json_load(tmp_path):
+    document = {"components": [component for component in DOCUMENT["components"] if isinstance(component, dict) and component]}
+    plain_path = tmp_path / "sbom.json"
+    plain_path.write_text(json.dumps(document))
+    gzip_path = tmp_path / "sbom.json.gz"
+    with gzip.open(gzip_path, "wt") as file:
+        json.dump(document, file)
+
+    expected = generate.load_sbom_file(str(plain_path), project=True)
+    assert [key for key, _ in expected] == ["org.a:a:1.0", "org.b:b:2.0", "org.c:c:3.0"]
+    assert generate.load_sbom_file(str(plain_path), streaming=True) == expected
+    assert generate.load_sbom_file(str(gzip_path), streaming=True) == expected
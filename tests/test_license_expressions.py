@@ -0,0 +1,65 @@
+import pytest
+
+import generate
+
+@pytest.mark.parametrize("expression, expected", [
+    ("MIT", ('license', 'MIT', False)),
+    ("GPL-2.0+", ('license', 'GPL-2.0', True)),
+    ("LicenseRef-custom", ('ref', 'LicenseRef-custom')),
+    ("MIT OR Apache-2.0 AND BSD-3-Clause",
+     ('or', (('license', 'MIT', False), ('and', (('license', 'Apache-2.0', False), ('license', 'BSD-3-Clause', False)))))),
+    ("(MIT OR Apache-2.0) AND BSD-3-Clause",
+     ('and', (('or', (('license', 'MIT', False), ('license', 'Apache-2.0', False))), ('license', 'BSD-3-Clause', False)))),
+    ("mit and apache-2.0 or isc",
+     ('or', (('and', (('license', 'mit', False), ('license', 'apache-2.0', False))), ('license', 'isc', False)))),
+    ("MIT AND Apache-2.0 AND ISC",
+     ('and', (('license', 'MIT', False), ('license', 'Apache-2.0', False), ('license', 'ISC', False)))),
+])
+def test_parse_precedence(expression, expected):
+    assert generate.parse_license_expression(expression) == expected
+
+@pytest.mark.parametrize("expression, expected", [
+    ("GPL-2.0-only WITH Classpath-exception-2.0", ('with', ('license', 'GPL-2.0-only', False), 'Classpath-exception-2.0')),
+    # The + belongs to the license, not to the exception
+    ("GPL-2.0+ WITH Classpath-exception-2.0", ('with', ('license', 'GPL-2.0', True), 'Classpath-exception-2.0')),
+    ("(GPL-2.0-only) WITH Classpath-exception-2.0", ('with', ('license', 'GPL-2.0-only', False), 'Classpath-exception-2.0')),
+    # WITH binds tighter than AND and OR
+    ("MIT OR GPL-2.0-only WITH Classpath-exception-2.0 AND ISC",
+     ('or', (('license', 'MIT', False),
+             ('and', (('with', ('license', 'GPL-2.0-only', False), 'Classpath-exception-2.0'), ('license', 'ISC', False)))))),
+])
+def test_parse_with(expression, expected):
+    assert generate.parse_license_expression(expression) == expected
+
+@pytest.mark.parametrize("expression, message", [
+    ("MIT WITH", "Unexpected end"),
+    ("MIT WITH Classpath-exception-2.0+", "Invalid exception"),
+    ("MIT WITH Foo WITH Bar", "Unexpected 'WITH'"),
+    ("LicenseRef-custom WITH Classpath-exception-2.0", "WITH must follow a license ID"),
+    ("(MIT OR GPL-2.0-only) WITH Classpath-exception-2.0", "WITH must follow a license ID"),
+    ("WITH Classpath-exception-2.0", "Unexpected 'WITH'"),
+    ("(MIT", "Unexpected end"),
+    ("MIT)", r"Unexpected '\)'"),
+    ("MIT AND", "Unexpected end"),
+    ("AND MIT", "Unexpected 'AND'"),
+    ("", "Unexpected end"),
+])
+def test_parse_errors(expression, message):
+    with pytest.raises(ValueError, match=message):
+        generate.parse_license_expression(expression)
+
+def test_resolve_or_later_and_exception(spdx_lookups):
+    licenses_lookup, exceptions_lookup = spdx_lookups
+    license_ids, license_names, references, exceptions = generate.resolve_license_expression(
+        "MIT-Stub-0.0+ WITH Stub-exception-0.0", licenses_lookup, exceptions_lookup)
+    assert license_ids == ('MIT-Stub-0.0', 'Stub-exception-0.0')
+    assert license_names == ('MIT Stub 0.0 License', 'Stub exception 0.0')
+    assert exceptions == ('stub-exception-0.0',)
+
+def test_resolve_case_and_license_ref(spdx_lookups):
+    licenses_lookup, exceptions_lookup = spdx_lookups
+    license_ids, license_names, references, exceptions = generate.resolve_license_expression(
+        "apache-stub-1.0 or LicenseRef-custom", licenses_lookup, exceptions_lookup)
+    assert license_ids == ('Apache-Stub-1.0', 'LicenseRef-custom')
+    assert references == ('https://spdx.org/licenses/Apache-Stub-1.0.html', 'No URL')
+    assert exceptions == ()
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import generate
+
+NAME_TO_ID_MAP = {"The MIT Stub Licence v0.0": ["MIT-Stub-0.0"], "Dual Stub License": ["MIT-Stub-0.0", "Apache-Stub-1.0"]}
+
+@pytest.fixture(scope="module")
+def index(aliased_lookups):
+    return generate.LicenseIndex.build(*aliased_lookups, NAME_TO_ID_MAP)
+
+@pytest.mark.parametrize("license_id, expected", [
+    ("MIT-Stub-0.0", "MIT-Stub-0.0"),
+    ("mit-stub-0.0", "MIT-Stub-0.0"),
+    # Deprecated IDs are aliased to their current equivalent, like GPL-2.0 to GPL-2.0-only
+    ("Legacy-Stub-1.0", "Legacy-Stub-1.0-only"),
+    ("legacy-stub-1.0", "Legacy-Stub-1.0-only"),
+    ("LEGACY-STUB-1.0+", "Legacy-Stub-1.0-or-later"),
+    ("Legacy-Stub-1.0-only+", "Legacy-Stub-1.0-or-later"),
+    # Without an -or-later ID, 'X+' is plain X
+    ("MIT-Stub-0.0+", "MIT-Stub-0.0"),
+    ("Legacy-Stub-1.0-or-later", "Legacy-Stub-1.0-or-later"),
+    ("No-Such-License", None),
+    ("No-Such-License+", None),
+])
+def test_license_id(index, license_id, expected):
+    assert index.license_id(license_id) == expected
+
+def test_exception_key(index):
+    assert index.exception_key("STUB-EXCEPTION-0.0") == "stub-exception-0.0"
+    assert index.exception_key("MIT-Stub-0.0") is None
+
+@pytest.mark.parametrize("name, expected", [
+    ("The MIT Stub Licence v0.0", ["MIT-Stub-0.0"]),
+    # Matched after normalization: case, 'licence', 'the', 'v' prefixes and trailing '.0's
+    ("mit stub license 0", ["MIT-Stub-0.0"]),
+    ("DUAL STUB LICENCE", ["MIT-Stub-0.0", "Apache-Stub-1.0"]),
+    ("MIT Stub 0.0 License", None),
+])
+def test_mapped_ids(index, name, expected):
+    assert index.mapped_ids(name) == expected
+
+@pytest.mark.parametrize("name, expected", [
+    ("MIT Stub 0.0 License", "MIT-Stub-0.0"),
+    ("The MIT Stub v0 Licence", "MIT-Stub-0.0"),
+    # A deprecated ID shares its name with its replacement, and the current ID wins
+    ("Legacy Stub License v1.0 only", "Legacy-Stub-1.0-only"),
+    ("legacy stub license 1 or later", "Legacy-Stub-1.0-or-later"),
+    ("Stub exception 1.0", "stub-exception-1.0"),
+    ("MIT Stub 0.0", None),
+])
+def test_match_name(index, name, expected):
+    assert index.match_name(name) == expected
+
+def test_suggest(index):
+    suggestions = index.suggest("Apache Stub 1.0 Licnse")
+    assert [license_id for license_id, _ in suggestions] == ["Apache-Stub-1.0", "Apache-Stub-11.0", "AGPL-Stub-18.0"]
+    assert suggestions[0][1] > suggestions[1][1] > suggestions[2][1] >= generate.SUGGESTION_MIN_SCORE
+    # A license ID is a candidate too, and an exact match scores 1
+    assert index.suggest("MIT Stub 0.0", limit=1) == [("MIT-Stub-0.0", 1.0)]
+    assert index.suggest("zzzz qqqq") == []
+
+def test_to_dict_round_trip(index):
+    restored = generate.LicenseIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+    assert restored.to_dict() == json.loads(json.dumps(index.to_dict()))
+    for license_id in ["mit-stub-0.0", "Legacy-Stub-1.0", "Legacy-Stub-1.0+", "MIT-Stub-0.0+", "No-Such-License"]:
+        assert restored.license_id(license_id) == index.license_id(license_id)
+    for name in ["The MIT Stub Licence v0.0", "dual stub license", "Legacy Stub License v1.0 only", "Apache Stub 1.0 Licnse"]:
+        assert restored.mapped_ids(name) == index.mapped_ids(name)
+        assert restored.match_name(name) == index.match_name(name)
+        assert restored.suggest(name) == index.suggest(name)
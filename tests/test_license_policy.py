@@ -0,0 +1,142 @@
+import pytest
+
+import generate
+
+MIT, APACHE, GPL, BSD = "MIT-Stub-0.0", "Apache-Stub-1.0", "GPL-Stub-2.0", "BSD-Stub-4.0"
+EXCEPTION = "Stub-exception-0.0"
+
+RULES = {
+    "licenses": {"allow": [MIT, APACHE], "review": [BSD], "deny": [GPL]},
+    "exceptions": {"review": [EXCEPTION]},
+    "default": "review",
+    "unknown": "deny",
+}
+
+@pytest.fixture(autouse=True)
+def fresh_resolution_cache():
+    # Resolutions are memoized globally, and the tests below resolve against more than one set of lookups
+    generate.clear_resolution_cache()
+    yield
+    generate.clear_resolution_cache()
+
+def make_policy(rules, lookups):
+    licenses_lookup, exceptions_lookup = lookups
+    return generate.LicensePolicy(rules, generate.get_license_index(licenses_lookup, exceptions_lookup), exceptions_lookup)
+
+def make_rows(components, lookups):
+    """Build report rows from (name, licenses) pairs, where licenses are CycloneDX license entries."""
+    rows = []
+    for name, licenses in components:
+        component = {"group": "org.stub", "name": name, "version": "1.0", "licenses": licenses}
+        rows.append(generate.process_component(f"org.stub:{name}:1.0", generate.make_component_record(component), *lookups))
+    return rows
+
+def expression(text):
+    return [{"expression": text}]
+
+def evaluate(rules, components, lookups, **kwargs):
+    return make_policy(rules, lookups).evaluate(make_rows(components, lookups), *lookups, **kwargs)
+
+def choices(policy, text, lookups):
+    """Return expression_choices as {status: sorted IDs}, which does not depend on the order bits were assigned in."""
+    node = generate.parse_license_expression(text)
+    return {status: sorted(policy.mask_labels(mask)) for status, mask in policy.expression_choices(node, *lookups).items()}
+
+@pytest.mark.parametrize("text, expected", [
+    (MIT, {0: [MIT]}),
+    (f"{MIT} OR {GPL}", {0: [MIT], 2: [GPL]}),
+    (f"{GPL} OR {BSD}", {2: [GPL], 1: [BSD]}),
+    (f"{MIT} AND {GPL}", {2: [GPL, MIT]}),
+    (f"{MIT} AND {APACHE}", {0: [APACHE, MIT]}),
+    (f"({MIT} OR {GPL}) AND ({APACHE} OR {BSD})", {0: [APACHE, MIT], 1: [BSD, MIT], 2: [APACHE, GPL]}),
+    # WITH is as strict as the stricter of the license and the exception
+    (f"{MIT} WITH {EXCEPTION}", {1: [MIT, "stub-exception-0.0"]}),
+    (f"{APACHE} OR {MIT} WITH {EXCEPTION}", {0: [APACHE], 1: [MIT, "stub-exception-0.0"]}),
+])
+def test_expression_choices(spdx_lookups, text, expected):
+    assert choices(make_policy(RULES, spdx_lookups), text, spdx_lookups) == expected
+
+def test_long_and_of_choices_stays_exact(spdx_lookups):
+    # Seven (allowed OR denied) terms ANDed together can still be satisfied with allowed licenses alone
+    text = " AND ".join([f"({MIT} OR {GPL})"] * 7)
+    assert choices(make_policy(RULES, spdx_lookups), text, spdx_lookups) == {0: [MIT], 2: [GPL, MIT]}
+    report = evaluate(RULES, [("many", expression(text))], spdx_lookups)
+    assert report["summary"]["allow"] == 1 and report["violations"] == []
+
+@pytest.mark.parametrize("text, status", [
+    (f"{MIT} OR {GPL}", "allow"),
+    (f"{MIT} AND {GPL}", "deny"),
+    (f"{GPL} OR {BSD}", "review"),
+    (f"{MIT} WITH {EXCEPTION}", "review"),
+])
+def test_evaluate_expression_status(spdx_lookups, text, status):
+    summary = evaluate(RULES, [("component", expression(text))], spdx_lookups)["summary"]
+    assert {key: summary[key] for key in generate.POLICY_STATUSES} == {key: int(key == status) for key in generate.POLICY_STATUSES}
+
+def test_violation_details(spdx_lookups):
+    report = evaluate(RULES, [("mixed", expression(f"{MIT} AND {GPL} AND {BSD}"))], spdx_lookups)
+    assert report["violations"] == [{
+        "component": "org.stub:mixed",
+        "version": "1.0",
+        "status": "deny",
+        "deny": [GPL],
+        "review": [BSD],
+        "licenses": "; ".join(f"License: {license_id}, https://spdx.org/licenses/{license_id}.html" for license_id in (MIT, GPL, BSD)),
+    }]
+
+@pytest.mark.parametrize("rule_id", ["legacy-stub-1.0", "LEGACY-STUB-1.0-ONLY", "Legacy-Stub-1.0"])
+def test_rule_ids_match_aliases_and_case(aliased_lookups, rule_id):
+    rules = {"licenses": {"deny": [rule_id], "allow": ["mit-stub-0.0"]}, "default": "review"}
+    report = evaluate(rules, [
+        ("legacy", [{"license": {"id": "Legacy-Stub-1.0"}}]),
+        ("current", expression("Legacy-Stub-1.0-only")),
+        ("lower", expression("legacy-stub-1.0")),
+        ("mit", [{"license": {"id": "MIT-STUB-0.0"}}]),
+    ], aliased_lookups)
+    assert [violation["component"] for violation in report["violations"]] == ["org.stub:legacy", "org.stub:current", "org.stub:lower"]
+    assert {tuple(violation["deny"]) for violation in report["violations"]} == {("Legacy-Stub-1.0-only",)}
+    assert report["summary"]["allow"] == 1
+
+@pytest.mark.parametrize("default, unknown", [("allow", "deny"), ("deny", "review"), ("review", "allow")])
+def test_default_and_unknown_statuses(spdx_lookups, default, unknown):
+    rules = {"licenses": {"allow": [MIT]}, "default": default, "unknown": unknown}
+    report = evaluate(rules, [
+        ("listed", expression(MIT)),
+        ("unlisted", expression(APACHE)),
+        ("unknown", [{"license": {"id": "No-Such-License"}}]),
+        ("unlicensed", []),
+    ], spdx_lookups)
+    statuses = {violation["component"]: violation["status"] for violation in report["violations"]}
+    expected = {"org.stub:unlisted": default, "org.stub:unknown": unknown, "org.stub:unlicensed": unknown}
+    assert statuses == {component: status for component, status in expected.items() if status != "allow"}
+
+@pytest.mark.parametrize("fail_on, components, failed", [
+    ("deny", [("ok", expression(MIT)), ("check", expression(BSD))], False),
+    ("review", [("ok", expression(MIT)), ("check", expression(BSD))], True),
+    ("review", [("ok", expression(MIT))], False),
+    ("deny", [("bad", expression(GPL))], True),
+    ("review", [("bad", expression(GPL))], True),
+])
+def test_fail_on(spdx_lookups, fail_on, components, failed):
+    summary = evaluate(RULES, components, spdx_lookups, fail_on=fail_on)["summary"]
+    assert summary["fail_on"] == fail_on
+    assert summary["failed"] is failed
+    assert generate.policy_failed(summary) is failed
+
+def test_entries_and_sets_reused_across_evaluate_calls(spdx_lookups, monkeypatch):
+    policy = make_policy(RULES, spdx_lookups)
+    first = make_rows([("a", expression(f"{MIT} AND {GPL}")), ("b", expression(MIT))], spdx_lookups)
+    # Another project with the same license entries in new rows, plus one new license set
+    second = make_rows([("c", expression(MIT)), ("d", expression(f"{MIT} AND {GPL}")), ("e", expression(MIT) + expression(APACHE))], spdx_lookups)
+    first_report = policy.evaluate(first, *spdx_lookups)
+    assert len(policy.entries) == 2 and len(policy.sets) == 2
+
+    compiled = []
+    entry_choices = policy.entry_choices
+    monkeypatch.setattr(policy, "entry_choices", lambda resolved, *lookups: compiled.append(resolved.entry_key) or entry_choices(resolved, *lookups))
+    second_report = policy.evaluate(second, *spdx_lookups)
+    # Only the APACHE entry is new; the MIT entry and both known sets come from the caches
+    assert compiled == [generate.intern_license_entry({"expression": APACHE})]
+    assert len(policy.entries) == 3 and len(policy.sets) == 3
+    assert second_report["violations"][0]["deny"] == first_report["violations"][0]["deny"] == [GPL]
+    assert [violation["component"] for violation in second_report["violations"]] == ["org.stub:d"]